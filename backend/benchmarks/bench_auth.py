@@ -0,0 +1,69 @@
+"""Per-request authentication overhead, before and after the token cache.
+
+Times the work an authenticated request does before the handler runs:
+
+  * decode+principal  - verify the JWT signature on every request, then take
+                        the user from the principal cache (the previous path)
+  * cached+principal  - claims from the verified-token cache, user from the
+                        principal cache (get_current_user)
+  * cached claims     - claims only, no user document (get_current_principal)
+
+The principal cache is pre-warmed, so no scenario touches MongoDB; on a
+principal-cache miss the first two would add a users lookup as well.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_auth --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from bson import ObjectId
+
+# dependencies reads these at import time; nothing here connects to them
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017/bench")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+
+import dependencies  # noqa: E402
+from services.token_cache import VerifiedTokenCache  # noqa: E402
+
+
+async def run(fn, token, requests):
+    # Batches keep timer overhead out of the per-call figure
+    batch = 100
+    samples = []
+    for _ in range(max(1, requests // batch)):
+        started = time.perf_counter()
+        for _ in range(batch):
+            await fn(token)
+        samples.append((time.perf_counter() - started) / batch * 1e6)
+    return samples
+
+
+async def main(args):
+    user = {"_id": ObjectId(), "email": "bench@example.com", "username": "bench", "games": ["valorant"]}
+    token = dependencies.create_access_token(dependencies.token_claims(user))
+    dependencies.principal_cache.set(user["email"], user)
+
+    cache = dependencies.token_cache
+    scenarios = [
+        ("decode+principal", dependencies.authenticate_token, VerifiedTokenCache(max_size=0)),
+        ("cached+principal", dependencies.authenticate_token, cache),
+        ("cached claims", dependencies.authenticate_principal, cache),
+    ]
+
+    print(f"{'scenario':<18} {'p50 us':>9} {'mean us':>9}")
+    for name, fn, token_cache in scenarios:
+        dependencies.token_cache = token_cache
+        samples = await run(fn, token, args.requests)
+        print(f"{name:<18} {statistics.median(samples):>9.2f} {statistics.mean(samples):>9.2f}")
+    dependencies.token_cache = cache
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000, help="authentications per scenario")
+    asyncio.run(main(parser.parse_args()))
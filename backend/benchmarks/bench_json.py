@@ -0,0 +1,141 @@
+"""Cost of serializing large list responses: default path vs FastJSONResponse.
+
+Serves 1k-item team and message lists from a small in-process app three ways:
+
+  * default     - return dicts with a response_model, so FastAPI validates,
+                  runs jsonable_encoder and encodes with the stdlib json
+  * fast        - return services.responses.FastJSONResponse (orjson)
+  * fast+gzip   - the same, for a client that accepts gzip
+
+and reports per-request latency and bytes on the wire.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_json --items 1000 --requests 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+
+from models.chat import MessageResponse
+from models.team import TeamResponse
+from services.responses import FastJSONResponse
+
+
+def make_teams(count):
+    now = datetime.utcnow().replace(microsecond=0)
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Team {i}",
+            "game": "valorant",
+            "description": "Looking for a consistent duo to climb ranked with. " * 3,
+            "skill_level": "intermediate",
+            "requirements": "Mic, 3+ evenings a week",
+            "max_members": 5,
+            "leader_id": str(ObjectId()),
+            "members": [str(ObjectId()) for _ in range(3)],
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def make_messages(count):
+    now = datetime.utcnow().replace(microsecond=0)
+    chat_id = str(ObjectId())
+    return [
+        {
+            "_id": ObjectId(),
+            "chat_id": chat_id,
+            "sender_id": str(ObjectId()),
+            "content": f"message {i}: see you in the lobby at nine?",
+            "created_at": now + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+
+
+def build_app(teams, messages) -> FastAPI:
+    app = FastAPI()
+
+    def with_ids(docs):
+        # What the routes did before: add "id" and leave "_id" in place
+        return [{**doc, "id": str(doc["_id"])} for doc in docs]
+
+    def shaped(docs):
+        # What the fast path expects: exactly the response model's fields
+        shaped_docs = []
+        for doc in docs:
+            doc = dict(doc)
+            doc["id"] = str(doc.pop("_id"))
+            shaped_docs.append(doc)
+        return shaped_docs
+
+    @app.get("/default/teams", response_model=List[TeamResponse])
+    async def default_teams():
+        return with_ids(teams)
+
+    @app.get("/fast/teams", response_model=List[TeamResponse])
+    async def fast_teams():
+        return FastJSONResponse(shaped(teams))
+
+    @app.get("/default/messages", response_model=List[MessageResponse])
+    async def default_messages():
+        return with_ids(messages)
+
+    @app.get("/fast/messages", response_model=List[MessageResponse])
+    async def fast_messages():
+        return FastJSONResponse(shaped(messages))
+
+    return app
+
+
+async def measure(client, path, accept_encoding, requests):
+    latencies = []
+    size = 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(path, headers={"Accept-Encoding": accept_encoding})
+        latencies.append((time.perf_counter() - started) * 1000)
+        size = response.num_bytes_downloaded
+    return latencies, size
+
+
+async def main(args):
+    app = build_app(make_teams(args.items), make_messages(args.items))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Both paths must produce the same document
+        for dataset in ("teams", "messages"):
+            default = (await client.get(f"/default/{dataset}")).json()
+            fast = (await client.get(f"/fast/{dataset}")).json()
+            assert default == fast, f"{dataset}: fast path output differs"
+
+        print(f"{'dataset':<10} {'path':<10} {'p50 ms':>9} {'mean ms':>9} {'bytes':>10}")
+        for dataset in ("teams", "messages"):
+            for name, prefix, encoding in (
+                ("default", "default", "identity"),
+                ("fast", "fast", "identity"),
+                ("fast+gzip", "fast", "gzip"),
+            ):
+                latencies, size = await measure(client, f"/{prefix}/{dataset}", encoding, args.requests)
+                print(
+                    f"{dataset:<10} {name:<10} {statistics.median(latencies):>9.2f} "
+                    f"{statistics.mean(latencies):>9.2f} {size:>10}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=1000, help="items per list response")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    asyncio.run(main(parser.parse_args()))
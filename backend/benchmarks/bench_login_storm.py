@@ -0,0 +1,102 @@
+"""Health-check latency while a burst of logins is being processed.
+
+Runs a small in-process app that mirrors the shape of /api/auth/login and
+/api/health and compares three scenarios:
+
+  * idle       - health probes only
+  * inline     - logins verify bcrypt directly inside the async handler
+  * offloaded  - logins go through services.password_hasher.PasswordHasher
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_login_storm --logins 200 --probes 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from passlib.context import CryptContext
+
+from services.password_hasher import PasswordHasher
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PASSWORD = "correct horse battery staple"
+PROBE_INTERVAL = 0.005
+
+
+def build_app(hasher: PasswordHasher, hashed_password: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    @app.post("/login/inline")
+    async def login_inline():
+        return {"ok": pwd_context.verify(PASSWORD, hashed_password)}
+
+    @app.post("/login/offloaded")
+    async def login_offloaded():
+        return {"ok": await hasher.verify(PASSWORD, hashed_password)}
+
+    return app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_scenario(client, mode, logins, probes):
+    async def login():
+        response = await client.post(f"/login/{mode}")
+        return response.status_code
+
+    async def probe_loop():
+        # Latency is measured from each probe's scheduled send time, so time
+        # spent waiting for a blocked event loop is counted against it.
+        latencies = []
+        started = time.perf_counter()
+        for i in range(probes):
+            scheduled = started + i * PROBE_INTERVAL
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await client.get("/api/health")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+        return latencies
+
+    login_tasks = [asyncio.create_task(login()) for _ in range(logins if mode != "idle" else 0)]
+    latencies = await probe_loop()
+    statuses = await asyncio.gather(*login_tasks)
+    return latencies, statuses
+
+
+async def main(args):
+    hashed_password = pwd_context.hash(PASSWORD)
+    hasher = PasswordHasher(pwd_context, max_workers=args.workers, max_pending=args.max_pending)
+    app = build_app(hasher, hashed_password)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'scenario':<10} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'logins ok':>10} {'503s':>6}")
+        for mode in ("idle", "inline", "offloaded"):
+            latencies, statuses = await run_scenario(client, mode, args.logins, args.probes)
+            print(
+                f"{mode:<10} {statistics.median(latencies):>9.2f} {percentile(latencies, 99):>9.2f} "
+                f"{max(latencies):>9.2f} {statuses.count(200):>10} {statuses.count(503):>6}"
+            )
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50, help="concurrent logins per scenario")
+    parser.add_argument("--probes", type=int, default=200, help="sequential /api/health probes per scenario")
+    parser.add_argument("--workers", type=int, default=4, help="password hash pool size")
+    parser.add_argument("--max-pending", type=int, default=64, help="queued hashes before logins get a 503")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+"""Matchmaking query latency against a large in-memory player index.
+
+Fills a MatchmakingIndex with synthetic players (1-4 of --games titles,
+random skill, play style and availability, plus a few with many games) and
+times find_matches for random seekers:
+
+  * all games   - ranked over every game the seeker plays
+  * one game    - filtered to one of the seeker's games (?game=)
+
+Nothing touches MongoDB.
+
+Usage (from the backend directory):
+
+    python -m benchmarks.bench_matchmaking --players 100000 --queries 500
+"""
+import argparse
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+from services.matchmaking import MAX_KEYED_GAMES, SKILL_LEVELS, MatchmakingIndex
+
+PLAY_STYLES = ["casual", "competitive", "semi-competitive"]
+SLOTS = [f"{day}-{part}" for day in range(7) for part in ("morning", "afternoon", "evening")]
+
+
+def player(rng, games, most_games=4):
+    return {
+        "_id": ObjectId(),
+        "username": "bench",
+        "games": rng.sample(games, rng.randint(1, most_games)),
+        "skill_level": rng.choice(SKILL_LEVELS),
+        "play_style": rng.choice(PLAY_STYLES),
+        "availability": rng.sample(SLOTS, rng.randint(0, 12)),
+    }
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    games = [f"game{i}" for i in range(args.games)]
+    index = MatchmakingIndex()
+
+    started = time.perf_counter()
+    for _ in range(args.players):
+        index.upsert(player(rng, games))
+    # Profiles past MAX_KEYED_GAMES are indexed differently; keep some around
+    for _ in range(args.players // 500):
+        index.upsert({**player(rng, games), "games": rng.sample(games, min(args.games, MAX_KEYED_GAMES + 2))})
+    print(f"indexed {index.stats()} in {time.perf_counter() - started:.1f}s")
+
+    seekers = [player(rng, games) for _ in range(args.queries)]
+    scenarios = [
+        ("all games", lambda seeker: index.find_matches(seeker, limit=args.limit)),
+        ("one game", lambda seeker: index.find_matches(seeker, game=seeker["games"][0], limit=args.limit)),
+    ]
+
+    print(f"{'scenario':<10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, query in scenarios:
+        samples = []
+        for seeker in seekers:
+            started = time.perf_counter()
+            query(seeker)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p95 = samples[int(len(samples) * 0.95)]
+        print(f"{name:<10} {statistics.median(samples):>8.3f} {p95:>8.3f} {samples[-1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=100000, help="players in the index")
+    parser.add_argument("--games", type=int, default=20, help="distinct game titles")
+    parser.add_argument("--queries", type=int, default=500, help="seekers per scenario")
+    parser.add_argument("--limit", type=int, default=10, help="matches per query")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,523 @@
+"""Load test for the REST and WebSocket surfaces of the full app.
+
+Starts main.app under uvicorn on a background thread, seeds users, teams,
+chats, messages and notifications, then drives these scenarios against it
+over real sockets:
+
+  * login_storm           - concurrent POST /api/auth/login (bcrypt verify)
+  * team_browse_join      - list teams by game, open one, join it, leave it
+  * chat_burst            - M WebSockets per chat room all sending at once;
+                            latency is send -> own broadcast received, then
+                            each member pages the room history
+  * notification_polling  - inbox page and unread count, as the UI polls
+  * chat_inbox            - each room member lists their chats, each with
+                            its last message (real MongoDB only, see below)
+
+Throughput and p50/p95/p99 are reported per endpoint, and the results are
+saved as JSON. Passing a previous run's file to --compare prints the p95
+change per endpoint, so runs from different commits can be compared.
+
+MongoDB is an in-memory mongomock-motor instance by default, which makes
+runs reproducible without a server but says nothing about query cost; pass
+--mongo-url to run against a real mongod (the database is dropped first).
+mongomock can't run the $lookup with `let` behind GET /api/chat/chats/, so
+chat_inbox only runs against a real mongod; in-memory runs skip it, say so,
+and list it under "skipped" in the results.
+The in-memory mode needs mongomock-motor, from the dev requirements:
+
+    pip install -r requirements-dev.txt
+
+Usage (from the backend directory):
+
+    python -m benchmarks.loadtest --output loadtest.json
+    python -m benchmarks.loadtest --mongo-url mongodb://localhost:27017/loadtest --compare loadtest.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+import websockets
+from bson import ObjectId
+
+PASSWORD = "loadtest-password"
+GAMES = ["valorant", "league_of_legends", "cs2", "dota2", "overwatch"]
+SKILL_LEVELS = ["beginner", "intermediate", "advanced", "professional"]
+PLAY_STYLES = ["casual", "competitive", "balanced"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    """Latencies (ms) and outcomes per endpoint label for one scenario."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, label, started, ok=True):
+        self.latencies[label].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            self.errors[label] += 1
+
+    async def request(self, client, label, method, url, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.add(label, started, ok=False)
+            return None
+        self.add(label, started, ok=response.status_code in expect)
+        return response
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def summary(self):
+        duration = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for label, samples in sorted(self.latencies.items()):
+            endpoints[label] = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "throughput_rps": round(len(samples) / duration, 1),
+                "mean_ms": round(statistics.mean(samples), 3),
+                "p50_ms": round(percentile(samples, 50), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+                "max_ms": round(max(samples), 3),
+            }
+        return {"duration_s": round(duration, 3), "endpoints": endpoints}
+
+
+class AppServer:
+    """main.app under uvicorn on its own thread and event loop, so the
+    load generator doesn't share a loop with the app it measures."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        # proto must be IPPROTO_TCP for asyncio to set TCP_NODELAY; with 0,
+        # keep-alive requests stall on Nagle plus delayed ACK (~40 ms)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False, lifespan="on"))
+        self.loop = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve(sockets=[self.sock]))
+
+    def start(self):
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("App server failed to start")
+            time.sleep(0.05)
+
+    def call(self, coro):
+        # Run a coroutine on the server's loop (where its Motor client lives)
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
+
+
+async def seed(db, args, password_hash):
+    rng = random.Random(args.seed)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    users = [
+        {
+            "_id": ObjectId(),
+            "username": f"player{i}",
+            "email": f"player{i}@loadtest.local",
+            "password": password_hash,
+            "games": rng.sample(GAMES, 2),
+            "skill_level": rng.choice(SKILL_LEVELS),
+            "play_style": rng.choice(PLAY_STYLES),
+            "availability": [],
+            "created_at": now,
+        }
+        for i in range(args.users)
+    ]
+    await db.users.insert_many(users)
+
+    teams = []
+    for i in range(args.teams):
+        leader = rng.choice(users)
+        created_at = now - timedelta(minutes=i)
+        # Room for every joiner, so join/leave never hits "team is full"
+        max_members = args.users + 1
+        teams.append({
+            "_id": ObjectId(),
+            "name": f"Team {i}",
+            "game": rng.choice(leader["games"]),
+            "description": "Looking for players for ranked and scrims.",
+            "skill_level": leader["skill_level"],
+            "requirements": "Mic required",
+            "max_members": max_members,
+            "leader_id": str(leader["_id"]),
+            "members": [str(leader["_id"])],
+            "member_count": 1,
+            "open_slots": max_members - 1,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+    if teams:
+        await db.teams.insert_many(teams)
+
+    chats = []
+    for i in range(args.rooms):
+        members = rng.sample(users, min(args.sockets_per_room, len(users)))
+        chats.append({
+            "_id": ObjectId(),
+            "name": f"Room {i}",
+            "participants": [str(user["_id"]) for user in members],
+            "type": "team",
+            "team_id": None,
+            "created_at": now,
+        })
+    if chats:
+        await db.chats.insert_many(chats)
+
+    messages = [
+        {
+            "chat_id": str(chat["_id"]),
+            "sender_id": rng.choice(chat["participants"]),
+            "content": f"seeded message {i}",
+            "created_at": now - timedelta(seconds=args.messages - i),
+        }
+        for chat in chats
+        for i in range(args.messages)
+    ]
+    if messages:
+        await db.messages.insert_many(messages)
+
+    notifications = [
+        {
+            "recipient_id": str(user["_id"]),
+            "type": "similar_interest",
+            "title": "New Team Alert",
+            "message": "A new team is looking for members!",
+            # Distinct per notification, as the fan-out dedup index expects
+            "team_id": str(ObjectId()),
+            "sender_id": None,
+            "read": i % 2 == 0,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for user in users
+        for i in range(args.notifications)
+    ]
+    if notifications:
+        await db.notifications.insert_many(notifications)
+
+    return users, teams, chats
+
+
+async def run_workers(concurrency, total, op):
+    # `concurrency` workers share `total` operations
+    remaining = iter(range(total))
+
+    async def worker():
+        for i in remaining:
+            await op(i)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def login_storm(client, args, fixtures, rng):
+    recorder = Recorder()
+    users = fixtures["users"]
+
+    async def login(_):
+        user = rng.choice(users)
+        await recorder.request(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                               data={"username": user["email"], "password": PASSWORD})
+
+    await run_workers(args.concurrency, args.logins, login)
+    recorder.finish()
+    return recorder
+
+
+async def team_browse_join(client, args, fixtures, rng):
+    recorder = Recorder()
+    users, teams, tokens = fixtures["users"], fixtures["teams"], fixtures["tokens"]
+
+    async def browse_and_join(_):
+        user = rng.choice(users)
+        headers = {"Authorization": f"Bearer {tokens[user['email']]}"}
+        game = rng.choice(user["games"])
+        await recorder.request(client, "GET /api/teams/", "GET", "/api/teams/",
+                               params={"game": game, "limit": 20}, headers=headers)
+        team_id = str(rng.choice(teams)["_id"])
+        await recorder.request(client, "GET /api/teams/{team_id}", "GET", f"/api/teams/{team_id}", headers=headers)
+        # 400 when the same user is already in (or is leading) the team
+        joined = await recorder.request(client, "POST /api/teams/{team_id}/join", "POST",
+                                        f"/api/teams/{team_id}/join", expect=(200, 400), headers=headers)
+        if joined is not None and joined.status_code == 200:
+            await recorder.request(client, "POST /api/teams/{team_id}/leave", "POST",
+                                   f"/api/teams/{team_id}/leave", headers=headers)
+
+    await run_workers(args.concurrency, args.team_ops, browse_and_join)
+    recorder.finish()
+    return recorder
+
+
+async def chat_burst(client, args, fixtures, rng):
+    recorder = Recorder()
+    tokens, users_by_id = fixtures["tokens"], fixtures["users_by_id"]
+    ws_url = str(client.base_url).rstrip("/").replace("http://", "ws://")
+
+    async def member(chat, user_id, ready, go):
+        token = tokens[users_by_id[user_id]["email"]]
+        url = f"{ws_url}/api/chat/ws/chat/{chat['_id']}?token={token}"
+        expected = len(chat["participants"]) * args.burst_messages
+        pending = {}
+
+        started = time.perf_counter()
+        async with websockets.connect(url, max_queue=None) as ws:
+            recorder.add("WS connect", started)
+            ready.release()
+            await go.wait()
+
+            async def receive():
+                received = 0
+                while received < expected:
+                    payload = json.loads(await ws.recv())
+                    if payload.get("type") == "error":
+                        recorder.errors["WS message round trip"] += 1
+                        continue
+                    received += 1
+                    sent_at = pending.pop(payload.get("content"), None)
+                    if sent_at is not None:
+                        recorder.add("WS message round trip", sent_at)
+
+            receiver = asyncio.create_task(receive())
+            for i in range(args.burst_messages):
+                content = f"{user_id}:{i}:{uuid.uuid4().hex[:8]}"
+                pending[content] = time.perf_counter()
+                await ws.send(json.dumps({"content": content}))
+            try:
+                await asyncio.wait_for(receiver, timeout=args.ws_timeout)
+            except asyncio.TimeoutError:
+                recorder.errors["WS message round trip"] += len(pending)
+
+        headers = {"Authorization": f"Bearer {token}"}
+        await recorder.request(client, "GET /api/chat/chats/{chat_id}/messages", "GET",
+                               f"/api/chat/chats/{chat['_id']}/messages", params={"limit": 50}, headers=headers)
+
+    members = [(chat, user_id) for chat in fixtures["chats"] for user_id in chat["participants"]]
+    ready = asyncio.Semaphore(0)
+    go = asyncio.Event()
+    tasks = [asyncio.create_task(member(chat, user_id, ready, go)) for chat, user_id in members]
+    # Every socket is open before anyone sends, so the burst is simultaneous
+    for _ in members:
+        await ready.acquire()
+    recorder.started = time.perf_counter()
+    go.set()
+    await asyncio.gather(*tasks)
+    recorder.finish()
+    return recorder
+
+
+async def notification_polling(client, args, fixtures, rng):
+    recorder = Recorder()
+    users, tokens = fixtures["users"], fixtures["tokens"]
+
+    async def poll(_):
+        user = rng.choice(users)
+        headers = {"Authorization": f"Bearer {tokens[user['email']]}"}
+        await recorder.request(client, "GET /api/notifications/me/", "GET", "/api/notifications/me/",
+                               params={"limit": 20}, headers=headers)
+        await recorder.request(client, "GET /api/notifications/me/unread-count", "GET",
+                               "/api/notifications/me/unread-count", headers=headers)
+
+    await run_workers(args.concurrency, args.polls, poll)
+    recorder.finish()
+    return recorder
+
+
+async def chat_inbox(client, args, fixtures, rng):
+    recorder = Recorder()
+    tokens, users_by_id = fixtures["tokens"], fixtures["users_by_id"]
+    members = [user_id for chat in fixtures["chats"] for user_id in chat["participants"]]
+
+    async def list_chats(_):
+        user = users_by_id[rng.choice(members)]
+        headers = {"Authorization": f"Bearer {tokens[user['email']]}"}
+        await recorder.request(client, "GET /api/chat/chats/", "GET", "/api/chat/chats/", headers=headers)
+
+    if members:
+        await run_workers(args.concurrency, args.inbox_polls, list_chats)
+    recorder.finish()
+    return recorder
+
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "team_browse_join": team_browse_join,
+    "chat_burst": chat_burst,
+    "notification_polling": notification_polling,
+    "chat_inbox": chat_inbox,
+}
+
+# Scenarios mongomock can't serve, with the reason they are skipped without --mongo-url
+REAL_MONGO_ONLY = {
+    "chat_inbox": "GET /api/chat/chats/ uses $lookup with let, which mongomock does not support",
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print(f"{'endpoint':<46} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+          + (f" {'p95 vs base':>12}" if baseline else ""))
+    for scenario, result in results["scenarios"].items():
+        print(f"[{scenario}] {result['duration_s']:.2f}s")
+        base_endpoints = (baseline or {}).get("scenarios", {}).get(scenario, {}).get("endpoints", {})
+        for label, stats in result["endpoints"].items():
+            line = (f"  {label:<44} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+                    f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+            base = base_endpoints.get(label)
+            if base:
+                change = (stats["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+                line += f" {change:>+11.1f}%"
+            print(line)
+    for scenario, reason in results["meta"].get("skipped", {}).items():
+        print(f"[{scenario}] skipped: {reason}")
+
+
+async def drive(args, server, fixtures, scenarios):
+    base_url = f"http://127.0.0.1:{server.port}"
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for name in scenarios:
+            recorder = await SCENARIOS[name](client, args, fixtures, rng)
+            results[name] = recorder.summary()
+    return results
+
+
+def main(args):
+    # dependencies reads these at import time, so they are set first
+    os.environ["MONGODB_URL"] = args.mongo_url or "mongodb://localhost:27017/loadtest"
+    os.environ.setdefault("JWT_SECRET", "loadtest-secret")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import dependencies
+
+    if args.mongo_url is None:
+        from mongomock_motor import AsyncMongoMockClient
+
+        mock_client = AsyncMongoMockClient()
+        dependencies.mongo_client_factory = lambda url, **options: mock_client
+
+    skipped = {}
+    if args.mongo_url is None:
+        skipped = {name: REAL_MONGO_ONLY[name] for name in args.scenarios if name in REAL_MONGO_ONLY}
+        for name, reason in skipped.items():
+            print(f"Skipping {name} on mongomock: {reason}; pass --mongo-url to run it")
+    scenarios = [name for name in args.scenarios if name not in skipped]
+
+    import main as app_main
+
+    server = AppServer(app_main.app)
+    server.start()
+    try:
+        db = dependencies.db
+        if args.mongo_url is not None:
+            server.call(db.client.drop_database(db.name))
+            from services.indexes import ensure_indexes
+            server.call(ensure_indexes(db))
+
+        seed_started = time.perf_counter()
+        users, teams, chats = server.call(seed(db, args, dependencies.pwd_context.hash(PASSWORD)))
+        print(f"Seeded {len(users)} users, {len(teams)} teams, {len(chats)} chats in {time.perf_counter() - seed_started:.1f}s")
+
+        fixtures = {
+            "users": users,
+            "users_by_id": {str(user["_id"]): user for user in users},
+            "teams": teams,
+            "chats": chats,
+            # Minted directly; only login_storm pays for password checks
+            "tokens": {user["email"]: dependencies.create_access_token(dependencies.token_claims(user)) for user in users},
+        }
+        scenarios = asyncio.run(drive(args, server, fixtures, scenarios))
+    finally:
+        server.stop()
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "mongo": "real" if args.mongo_url else "mongomock",
+            "skipped": skipped,
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("mongo_url", "output", "compare")},
+        },
+        "scenarios": scenarios,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", help="real MongoDB to run against (default: in-memory mongomock-motor)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--users", type=int, default=200, help="seeded users")
+    parser.add_argument("--teams", type=int, default=500, help="seeded teams")
+    parser.add_argument("--rooms", type=int, default=10, help="seeded chat rooms, all used by chat_burst")
+    parser.add_argument("--sockets-per-room", type=int, default=10, help="members, and WebSockets, per room")
+    parser.add_argument("--messages", type=int, default=50, help="seeded messages per room")
+    parser.add_argument("--notifications", type=int, default=20, help="seeded notifications per user")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent HTTP clients")
+    parser.add_argument("--logins", type=int, default=200, help="login_storm: logins")
+    parser.add_argument("--team-ops", type=int, default=1000, help="team_browse_join: browse/join/leave rounds")
+    parser.add_argument("--burst-messages", type=int, default=20, help="chat_burst: messages sent per socket")
+    parser.add_argument("--ws-timeout", type=float, default=60, help="chat_burst: seconds to wait for a room's broadcasts")
+    parser.add_argument("--polls", type=int, default=1000, help="notification_polling: polls")
+    parser.add_argument("--inbox-polls", type=int, default=500, help="chat_inbox: chat list requests")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for data and request mix")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="previous results JSON to compare p95 against")
+    main(parser.parse_args())
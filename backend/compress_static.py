@@ -0,0 +1,58 @@
+"""Write precompressed .gz and .br siblings for the built frontend.
+
+Run after the frontend build is copied into static/. services/static_assets
+serves these variants to clients that accept them, so the API workers never
+compress at request time.
+"""
+import gzip
+import logging
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are still written
+    brotli = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".ico", ".webmanifest"}
+# Below this the headers cost more than compression saves
+MIN_SIZE = 1024
+
+
+def compress_static(static_dir: Path):
+    written = saved = 0
+    for path in sorted(static_dir.rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        if len(data) < MIN_SIZE:
+            continue
+
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data, quality=11)
+
+        for suffix, compressed in variants.items():
+            target = path.with_name(path.name + suffix)
+            # Only keep variants that are actually smaller
+            if len(compressed) < len(data):
+                target.write_bytes(compressed)
+                written += 1
+                saved += len(data) - len(compressed)
+            elif target.exists():
+                target.unlink()
+
+    if brotli is None:
+        logger.warning("brotli is not installed; only gzip variants were written")
+    logger.info(f"Wrote {written} precompressed files, saving {saved / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    static_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "static"
+    if not static_dir.is_dir():
+        logger.error(f"Static directory does not exist at {static_dir}")
+        sys.exit(1)
+    compress_static(static_dir)
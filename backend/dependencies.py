@@ -2,15 +2,23 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReadPreference, WriteConcern
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 import os
+import time
 from dotenv import load_dotenv
 import logging
 from urllib.parse import urlparse
+from bson import ObjectId
+from services.principal_cache import PrincipalCache
+from services.password_hasher import PasswordHasher
+from services.job_queue import JobQueue
+from services.mongo_monitoring import PoolMonitor
+from services.metrics import CommandMetrics
+from services.token_cache import VerifiedTokenCache
+from services.refresh_tokens import RevocationList, RefreshTokenStore
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Load environment variables
@@ -21,16 +29,81 @@ MONGODB_URL = os.getenv("MONGODB_URL")
 if not MONGODB_URL:
     raise ValueError("MONGODB_URL environment variable is not set")
 
-try:
-    client = AsyncIOMotorClient(MONGODB_URL)
-    # Parse database name from MongoDB URL
-    parsed_url = urlparse(MONGODB_URL)
-    db_name = parsed_url.path.strip('/') or 'esports_team_finder'
+# Parse database name from MongoDB URL
+parsed_url = urlparse(MONGODB_URL)
+db_name = parsed_url.path.strip('/') or 'esports_team_finder'
+
+# Connection pool, per worker process
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0")) or None  # 0 = never close idle connections
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0")) or None  # 0 = wait for a connection indefinitely
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+
+# Listing endpoints may read from secondaries (e.g. "secondaryPreferred")
+# at the cost of possibly lagging behind recent writes
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+MONGO_LIST_READ_PREFERENCE = os.getenv("MONGO_LIST_READ_PREFERENCE", "primary")
+if MONGO_LIST_READ_PREFERENCE not in READ_PREFERENCES:
+    raise ValueError(f"MONGO_LIST_READ_PREFERENCE must be one of: {', '.join(READ_PREFERENCES)}")
+
+# Write concern for chat messages: a node count or "majority"
+MONGO_CHAT_WRITE_CONCERN = os.getenv("MONGO_CHAT_WRITE_CONCERN", "1")
+
+# Builds the client in connect_to_mongo; the load-test harness swaps in an
+# in-memory stand-in
+mongo_client_factory = AsyncIOMotorClient
+
+# Set by connect_to_mongo during application startup
+client = None
+db = None
+list_db = None
+chat_db = None
+pool_monitor = PoolMonitor()
+command_metrics = CommandMetrics()
+
+async def connect_to_mongo():
+    global client, db, list_db, chat_db
+    try:
+        client = mongo_client_factory(
+            MONGODB_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[pool_monitor, command_metrics]
+        )
+        # Fail startup rather than the first request if the server is unreachable
+        await client.admin.command("ping")
+    except Exception as e:
+        logger.error(f"Failed to connect to MongoDB: {str(e)}")
+        raise
+
     db = client[db_name]
+    list_db = client.get_database(db_name, read_preference=READ_PREFERENCES[MONGO_LIST_READ_PREFERENCE])
+    write_concern = MONGO_CHAT_WRITE_CONCERN
+    chat_db = client.get_database(db_name, write_concern=WriteConcern(w=int(write_concern) if write_concern.isdigit() else write_concern))
     logger.info(f"Connected to MongoDB database: {db_name}")
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {str(e)}")
-    raise
+
+async def close_mongo_connection():
+    if client is not None:
+        client.close()
+        logger.info("Closed MongoDB connection")
+
+# Logging (configured by main via services.log_pipeline): "json" or "text"
+# output, and per-logger caps on records per second; ERROR and above are
+# never capped. LOG_RATE_LIMITS is e.g. "routes.auth=5,dependencies=10".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "100"))
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "")
 
 # CORS configuration
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://esports-team-finder.onrender.com")
@@ -48,17 +121,79 @@ if not SECRET_KEY:
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24 hours default
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))  # 7 days default
+# A refresh token reused this soon after its rotation is a concurrent refresh, not theft
+REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+
+# Chat WebSocket fan-out
+CHAT_SEND_QUEUE_SIZE = int(os.getenv("CHAT_SEND_QUEUE_SIZE", "64"))
+CHAT_SEND_TIMEOUT_SECONDS = float(os.getenv("CHAT_SEND_TIMEOUT_SECONDS", "5"))
+
+# Message inserts are coalesced into insert_many batches
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "100"))
+MESSAGE_BATCH_LINGER_MS = float(os.getenv("MESSAGE_BATCH_LINGER_MS", "2"))
+
+# Background jobs (notification fan-out)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+job_queue = JobQueue(workers=JOB_WORKERS, max_attempts=JOB_MAX_ATTEMPTS)
+
+# "New team" fan-out: insert chunk size and per-recipient hourly cap
+FANOUT_CHUNK_SIZE = int(os.getenv("FANOUT_CHUNK_SIZE", "500"))
+FANOUT_MAX_PER_RECIPIENT_PER_HOUR = int(os.getenv("FANOUT_MAX_PER_RECIPIENT_PER_HOUR", "10"))
+
+# Read notifications are deleted by a TTL index after this many days
+NOTIFICATION_READ_TTL_DAYS = int(os.getenv("NOTIFICATION_READ_TTL_DAYS", "30"))
+
+# Unread counters are recounted from the notifications at startup and then
+# this often, repairing any drift
+UNREAD_RECONCILE_SECONDS = float(os.getenv("UNREAD_RECONCILE_SECONDS", "3600"))
+
+# Cross-worker pub/sub: "memory" (single process), "unix" (workers on one
+# host) or "mongo" (change streams, needs a replica set)
+BACKPLANE = os.getenv("BACKPLANE", "memory")
+BACKPLANE_SOCKET_DIR = os.getenv("BACKPLANE_SOCKET_DIR", "/tmp/esports-team-finder-backplane")
+
+# Authenticated-principal cache (per process)
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "4096"))
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+principal_cache = PrincipalCache(max_size=PRINCIPAL_CACHE_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS)
+
+# Verified access tokens and their claims (per process); entries live
+# until the token expires
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "8192"))
+token_cache = VerifiedTokenCache(max_size=TOKEN_CACHE_SIZE)
+
+# Refresh-token families in Mongo, plus the per-process list of users whose
+# tokens were revoked; revocations are kept as long as an access token lives
+revocations = RevocationList(retention_seconds=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+refresh_tokens = RefreshTokenStore(
+    revocations,
+    lifetime=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    reuse_grace=timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)
+)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# bcrypt runs on a bounded worker pool so logins don't block the event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+password_hasher = PasswordHasher(pwd_context, max_workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING)
+
+def token_claims(user: dict) -> dict:
+    # Access tokens carry the caller's id and username so routes that need
+    # nothing else can authorize without a user lookup
+    return {"sub": user["email"], "uid": str(user["_id"]), "username": user["username"]}
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "type": "access"})  # Add token type
+    # iat is kept to sub-second precision so revoke-all can't miss a token
+    # issued in the same second
+    to_encode.update({"exp": expire, "iat": time.time(), "type": "access"})  # Add token type
     try:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        logger.info(f"Created access token for user: {data.get('sub')}")
+        logger.debug("Created access token for user: %s", data.get('sub'))
         return encoded_jwt
     except Exception as e:
         logger.error(f"Error creating access token: {str(e)}")
@@ -73,7 +208,7 @@ def create_refresh_token(data: dict):
     to_encode.update({"exp": expire, "type": "refresh"})
     try:
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-        logger.info(f"Created refresh token for user: {data.get('sub')}")
+        logger.debug("Created refresh token for user: %s", data.get('sub'))
         return encoded_jwt
     except Exception as e:
         logger.error(f"Error creating refresh token: {str(e)}")
@@ -83,42 +218,79 @@ def create_refresh_token(data: dict):
         )
 
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    credentials_exception = HTTPException(
+    # The full user document; for routes that read the caller's profile
+    return await authenticate_token(token)
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)):
+    # Just the caller's _id, email and username, from the token alone
+    return await authenticate_principal(token)
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_access_token(token: str) -> dict:
+    # Signature checks are paid once per token per process; after that the
+    # claims come from the verified-token cache until the token expires
+    claims = token_cache.get(token)
+    if claims is not None:
+        if revocations.is_revoked(claims):
+            raise credentials_exception()
+        return claims
+
     try:
-        logger.info("Decoding JWT token")
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        # Check token type
-        token_type = payload.get("type")
-        if token_type != "access":
-            logger.warning("Invalid token type")
-            raise credentials_exception
-            
-        email: str = payload.get("sub")
-        if email is None:
-            logger.warning("No email found in token")
-            raise credentials_exception
-            
-        logger.info(f"Looking up user with email: {email}")
-        user = await db.users.find_one({"email": email})
-        
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        logger.warning("JWT Error: %s", e)
+        raise credentials_exception()
+
+    if claims.get("type") != "access" or claims.get("sub") is None:
+        logger.warning("Rejected token: not an access token")
+        raise credentials_exception()
+
+    if revocations.is_revoked(claims):
+        logger.warning("Rejected token: revoked")
+        raise credentials_exception()
+
+    token_cache.set(token, claims)
+    return claims
+
+async def authenticate_token(token: str):
+    # Shared by the HTTP dependency above and WebSocket handshakes
+    email = decode_access_token(token)["sub"]
+    try:
+        user = principal_cache.get(email)
         if user is None:
-            logger.warning(f"No user found with email: {email}")
-            raise credentials_exception
-            
-        logger.info(f"Successfully authenticated user: {email}")
+            user = await db.users.find_one({"email": email})
+            if user is None:
+                logger.warning("No user found with email: %s", email)
+                raise credentials_exception()
+            principal_cache.set(email, user)
         return user
-        
-    except JWTError as e:
-        logger.error(f"JWT Error: {str(e)}")
-        raise credentials_exception
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
-        raise credentials_exception
+        raise credentials_exception()
+
+async def authenticate_principal(token: str) -> dict:
+    claims = decode_access_token(token)
+    if "uid" not in claims:
+        # Issued before tokens carried profile claims
+        user = await authenticate_token(token)
+        return {"_id": user["_id"], "email": user["email"], "username": user["username"]}
+    return {"_id": ObjectId(claims["uid"]), "email": claims["sub"], "username": claims.get("username")}
+
+def invalidate_user(email: str):
+    # Call whenever a user document changes so the next request re-reads it
+    principal_cache.invalidate(email)
 
 async def get_db():
     return db
+
+async def get_list_db():
+    # For listing endpoints; honours MONGO_LIST_READ_PREFERENCE
+    return list_db
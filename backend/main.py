@@ -1,18 +1,67 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from routes import auth, teams, chat
-from dependencies import CORS_ORIGINS
+from routes import auth, teams, chat, notifications, users
+import dependencies
+from dependencies import CORS_ORIGINS, LOG_LEVEL, LOG_FORMAT, LOG_RATE_LIMIT, LOG_RATE_LIMITS, BACKPLANE, BACKPLANE_SOCKET_DIR, connect_to_mongo, close_mongo_connection, principal_cache, token_cache, password_hasher, job_queue, pool_monitor, revocations, UNREAD_RECONCILE_SECONDS
+from services.backplane import create_backplane
+from services.indexes import ensure_indexes
+from services.static_assets import StaticAssets
+from services.log_pipeline import RequestIdMiddleware, parse_rates, setup_logging
+from services.metrics import MetricsMiddleware, StatsCollector, registry as metrics_registry
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from contextlib import asynccontextmanager
 import logging
 import os
 from pathlib import Path
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging: one queue-backed handler for the whole process
+setup_logging(LOG_LEVEL, LOG_FORMAT, LOG_RATE_LIMIT, parse_rates(LOG_RATE_LIMITS))
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Ensure static directory exists
+static_dir = Path(__file__).parent / "static"
+static_dir.mkdir(exist_ok=True)
+static_assets = StaticAssets()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    static_assets.load(static_dir)
+    await connect_to_mongo()
+    db = dependencies.db
+
+    await ensure_indexes(db)
+    await teams.backfill_team_counters(db)
+    await notifications.reconcile_unread_counters(db)
+
+    backplane = create_backplane(BACKPLANE, db=db, socket_dir=BACKPLANE_SOCKET_DIR)
+    chat.hub.attach(backplane)
+    notifications.bus.attach(backplane)
+    users.matchmaking.attach(backplane)
+    teams.recommender.attach(backplane)
+    revocations.attach(backplane)
+    await backplane.start()
+    app.state.backplane = backplane
+    logger.info(f"Started {BACKPLANE} backplane")
+
+    chat.message_writer.start(dependencies.chat_db.messages)
+
+    await revocations.load(db)
+    await users.matchmaking.load(db)
+    # After the matchmaking index, which supplies each leader's play style
+    await teams.recommender.load(db, play_style_of=users.matchmaking.play_style)
+
+    job_queue.every("reconcile_unread_counters", UNREAD_RECONCILE_SECONDS, notifications.reconcile_unread_counters, db)
+    job_queue.start()
+
+    yield
+
+    await job_queue.stop()
+    await chat.message_writer.stop()
+    await backplane.stop()
+    password_hasher.shutdown()
+    await close_mongo_connection()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -24,58 +73,68 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Per-route latency, in-flight and MongoDB command metrics; added after
+# CORS so the timings include it
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+
+# Request ids for log records, echoed back as X-Request-ID
+app.add_middleware(RequestIdMiddleware)
+
 # API routes
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(teams.router, prefix="/api/teams", tags=["teams"])
 app.include_router(chat.router, prefix="/api/chat", tags=["chat"])
-
-# Ensure static directory exists
-static_dir = Path(__file__).parent / "static"
-static_dir.mkdir(exist_ok=True)
+app.include_router(users.router, prefix="/api/users", tags=["users"])
+app.include_router(notifications.router, prefix="/api/notifications", tags=["notifications"])
 
 # Health check endpoint
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
 
-# Mount static files
-try:
-    app.mount("/", StaticFiles(directory=str(static_dir), html=True), name="static")
-    logger.info(f"Successfully mounted static files from {static_dir}")
-except Exception as e:
-    logger.error(f"Failed to mount static files: {e}")
-    raise  # We should raise the error to know if there's an issue
-
-# Serve frontend
-@app.get("/{full_path:path}")
-async def serve_frontend(full_path: str):
-    try:
-        # Skip API routes
-        if full_path.startswith("api/"):
-            logger.debug(f"Skipping API route: {full_path}")
-            raise HTTPException(status_code=404, detail="Not Found")
-            
-        # Path to the static directory
-        static_path = Path(__file__).parent / "static"
-        logger.debug(f"Looking for file in static directory: {static_path}")
-        
-        # Try to serve the exact file if it exists
-        requested_path = static_path / full_path
-        if requested_path.is_file():
-            logger.debug(f"Serving requested file: {requested_path}")
-            return FileResponse(requested_path)
-        
-        # Look for index.html
-        index_path = static_path / "index.html"
-        if index_path.is_file():
-            logger.debug(f"Serving index.html for path: {full_path}")
-            return FileResponse(index_path)
-            
-        logger.warning(f"File not found: {full_path}")
-        return FileResponse(index_path)  # Always return index.html for client-side routing
-    except Exception as e:
-        logger.error(f"Error serving frontend: {str(e)}")
-        raise
+# Auth cache and password-hash pool counters
+@app.get("/api/health/cache")
+async def cache_stats():
+    return {
+        "token_cache": token_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+    }
+
+# MongoDB connection pool gauges, per server
+@app.get("/api/health/db")
+async def db_pool_stats():
+    return {"pools": pool_monitor.stats()}
+
+# Service gauges (WebSocket rooms and connections, SSE streams, pools,
+# caches, queues), read on each scrape
+metrics_registry.register(StatsCollector({
+    "chat_hub": lambda: chat.hub.stats(),
+    "notification_streams": lambda: notifications.bus.stats(),
+    "chat_message_writer": lambda: chat.message_writer.stats(),
+    "job_queue": lambda: job_queue.stats(),
+    "mongo_pool": lambda: pool_monitor.stats(),
+    "token_cache": lambda: token_cache.stats(),
+    "principal_cache": lambda: principal_cache.stats(),
+    "password_hasher": lambda: password_hasher.stats(),
+}))
+
+# Prometheus scrape endpoint
+@app.get("/api/metrics")
+async def metrics():
+    return Response(generate_latest(metrics_registry), media_type=CONTENT_TYPE_LATEST)
+
+# Serve the frontend from the in-memory asset manifest; unknown paths get
+# index.html for client-side routing
+@app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+async def serve_frontend(full_path: str, request: Request):
+    if full_path.startswith("api/"):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    asset = static_assets.get(full_path) or static_assets.get("index.html")
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Frontend not built")
+    return static_assets.response(asset, request)
 
 if __name__ == "__main__":
     import uvicorn
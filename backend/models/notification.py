@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
@@ -20,3 +20,7 @@ class NotificationResponse(BaseModel):
     sender_id: Optional[str]
     read: bool = False
     created_at: datetime
+
+class NotificationReadRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    up_to: Optional[str] = None  # mark everything up to and including this id
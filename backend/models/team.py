@@ -30,3 +30,6 @@ class TeamResponse(BaseModel):
     members: List[str]
     created_at: datetime
     updated_at: datetime
+
+class TeamRecommendation(TeamResponse):
+    score: float
@@ -0,0 +1,17 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+class ProfileUpdate(BaseModel):
+    games: Optional[List[str]] = None
+    skill_level: Optional[str] = None
+    play_style: Optional[str] = None
+    availability: Optional[List[str]] = None
+
+class PlayerMatch(BaseModel):
+    id: str
+    username: str
+    games: List[str]
+    skill_level: Optional[str]
+    play_style: Optional[str]
+    availability: List[str] = []
+    score: float
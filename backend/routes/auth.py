@@ -1,15 +1,38 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime
-from dependencies import get_db, create_access_token, create_refresh_token, pwd_context, get_current_user, oauth2_scheme, jwt, SECRET_KEY, ALGORITHM
+from pymongo.errors import DuplicateKeyError
+from dependencies import get_db, create_access_token, create_refresh_token, token_claims, password_hasher, get_current_user, get_current_principal, invalidate_user, refresh_tokens, oauth2_scheme, jwt, SECRET_KEY, ALGORITHM
+from models.user import ProfileUpdate
+from routes.users import publish_player
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def issue_tokens(db, user: dict) -> dict:
+    # A fresh login starts a new refresh-token family
+    claims = token_claims(user)
+    family = await refresh_tokens.issue(db, claims["uid"])
+    return {
+        "access_token": create_access_token(claims),
+        "refresh_token": create_refresh_token({**claims, **family}),
+        "token_type": "bearer"
+    }
+
+def decode_refresh_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.JWTError:
+        payload = {}
+    if payload.get("type") != "refresh" or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+    return payload
+
 @router.post("/register")
 async def register(
     username: str = Form(...),
@@ -18,29 +41,30 @@ async def register(
     games: str = Form(...),
     skill_level: str = Form(...),
     play_style: str = Form(...),
+    availability: str = Form(""),
     db = Depends(get_db)
 ):
     try:
-        logger.info(f"Attempting to register user with email: {email}")
+        logger.debug("Attempting to register user with email: %s", email)
         
         # Check if user already exists
         existing_user = await db.users.find_one({"$or": [{"email": email}, {"username": username}]})
         if existing_user:
             if existing_user["email"] == email:
-                logger.warning(f"User with email {email} already exists")
+                logger.warning("User with email %s already exists", email)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Email already registered"
                 )
             else:
-                logger.warning(f"Username {username} already exists")
+                logger.warning("Username %s already exists", username)
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Username already taken"
                 )
 
         # Hash the password
-        hashed_password = pwd_context.hash(password)
+        hashed_password = await password_hasher.hash(password)
         
         # Prepare user document
         user_data = {
@@ -50,21 +74,26 @@ async def register(
             "games": games.split(","),
             "skill_level": skill_level,
             "play_style": play_style,
+            "availability": [slot for slot in availability.split(",") if slot],
             "created_at": datetime.utcnow()
         }
         
-        # Insert user into database
-        result = await db.users.insert_one(user_data)
-        logger.info(f"Successfully created user with id: {result.inserted_id}")
+        # Insert user into database; the unique indexes catch a concurrent
+        # registration that slipped past the check above
+        try:
+            result = await db.users.insert_one(user_data)
+        except DuplicateKeyError as e:
+            if "username" in (e.details or {}).get("keyPattern", {}):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already taken")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+        logger.info("Created user with id: %s", result.inserted_id)
+        await publish_player(user_data)
         
-        # Generate access token
-        access_token = create_access_token(
-            data={"sub": email}
-        )
+        # Generate access and refresh tokens
+        tokens = await issue_tokens(db, user_data)
         
         return {
-            "access_token": access_token,
-            "token_type": "bearer",
+            **tokens,
             "email": email,
             "username": username
         }
@@ -84,33 +113,27 @@ async def login(
     db = Depends(get_db)
 ):
     try:
-        logger.info(f"Login attempt for: {form_data.username}")
+        logger.debug("Login attempt for: %s", form_data.username)
         user = await db.users.find_one({"email": form_data.username})
         
         if not user:
-            logger.warning(f"User not found: {form_data.username}")
+            logger.warning("User not found: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
             
-        if not pwd_context.verify(form_data.password, user["password"]):
-            logger.warning(f"Invalid password for user: {form_data.username}")
+        if not await password_hasher.verify(form_data.password, user["password"]):
+            logger.warning("Invalid password for user: %s", form_data.username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
             )
             
-        access_token_data = {"sub": user["email"]}
-        access_token = create_access_token(access_token_data)
-        refresh_token = create_refresh_token(access_token_data)
+        tokens = await issue_tokens(db, user)
         
-        logger.info(f"Login successful for user {form_data.username}")
-        return {
-            "access_token": access_token,
-            "refresh_token": refresh_token,
-            "token_type": "bearer"
-        }
+        logger.debug("Login successful for user %s", form_data.username)
+        return tokens
         
     except HTTPException:
         raise
@@ -126,43 +149,11 @@ async def refresh_token(
     token: str = Depends(oauth2_scheme),
     db = Depends(get_db)
 ):
+    # The refresh token carries the access-token claims, so rotating it is
+    # the only database round trip; no user lookup
+    payload = decode_refresh_token(token)
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") != "refresh":
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid refresh token"
-            )
-            
-        email = payload.get("sub")
-        if email is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid refresh token"
-            )
-            
-        user = await db.users.find_one({"email": email})
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found"
-            )
-            
-        access_token_data = {"sub": email}
-        new_access_token = create_access_token(access_token_data)
-        new_refresh_token = create_refresh_token(access_token_data)
-        
-        return {
-            "access_token": new_access_token,
-            "refresh_token": new_refresh_token,
-            "token_type": "bearer"
-        }
-        
-    except jwt.JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid refresh token"
-        )
+        rotated = await refresh_tokens.rotate(db, payload)
     except Exception as e:
         logger.error(f"Refresh token error: {str(e)}")
         raise HTTPException(
@@ -170,6 +161,40 @@ async def refresh_token(
             detail="Internal server error during token refresh"
         )
 
+    # Spent, revoked, or issued before rotation existed
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token"
+        )
+
+    claims = {"sub": payload["sub"], "uid": payload["uid"], "username": payload["username"]}
+    return {
+        "access_token": create_access_token(claims),
+        "refresh_token": create_refresh_token({**claims, **rotated}),
+        "token_type": "bearer"
+    }
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    db = Depends(get_db)
+):
+    # Takes the refresh token and revokes its family; the access token
+    # stays valid until it expires
+    payload = decode_refresh_token(token)
+    if "fam" in payload:
+        await refresh_tokens.revoke_family(db, payload["fam"])
+
+@router.post("/logout-all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_all(
+    current_user: dict = Depends(get_current_principal),
+    db = Depends(get_db)
+):
+    # Revokes every refresh token and every access token issued so far
+    await refresh_tokens.revoke_all(db, str(current_user["_id"]))
+    logger.info(f"Revoked all tokens for user {current_user['email']}")
+
 @router.get("/profile")
 async def get_current_user_profile(current_user: dict = Depends(get_current_user)):
     try:
@@ -181,6 +206,7 @@ async def get_current_user_profile(current_user: dict = Depends(get_current_user
             "games": current_user["games"],
             "skill_level": current_user["skill_level"],
             "play_style": current_user["play_style"],
+            "availability": current_user.get("availability", []),
         }
         return user_data
     except Exception as e:
@@ -189,3 +215,31 @@ async def get_current_user_profile(current_user: dict = Depends(get_current_user
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error fetching user profile"
         )
+
+@router.put("/profile")
+async def update_current_user_profile(
+    profile_update: ProfileUpdate,
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_db)
+):
+    update_data = profile_update.dict(exclude_unset=True)
+    if update_data:
+        update_data["updated_at"] = datetime.utcnow()
+        await db.users.update_one(
+            {"_id": current_user["_id"]},
+            {"$set": update_data}
+        )
+        # Drop the cached principal so the next request sees the new profile
+        invalidate_user(current_user["email"])
+        current_user.update(update_data)
+        await publish_player(current_user)
+
+    return {
+        "id": str(current_user["_id"]),
+        "username": current_user["username"],
+        "email": current_user["email"],
+        "games": current_user["games"],
+        "skill_level": current_user["skill_level"],
+        "play_style": current_user["play_style"],
+        "availability": current_user.get("availability", []),
+    }
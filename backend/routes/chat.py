@@ -1,129 +1,216 @@
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from bson import ObjectId
-from datetime import datetime
 import json
-from dependencies import get_current_user, get_db
+from pydantic import ValidationError
+from dependencies import authenticate_principal, get_current_principal, get_db, get_list_db, CHAT_SEND_QUEUE_SIZE, CHAT_SEND_TIMEOUT_SECONDS, MESSAGE_BATCH_SIZE, MESSAGE_BATCH_LINGER_MS
 from models.chat import ChatCreate, ChatResponse, MessageCreate, MessageResponse
+from services.chat_hub import ChatHub
+from services.message_writer import MessageWriter
+from services.mapping import DocumentMapper
+from services.responses import FastJSONResponse
+from services.timestamps import utc_now_ms
 
 router = APIRouter()
 
-# Store active websocket connections: chat_id -> list of websockets
-active_connections: Dict[str, List[WebSocket]] = {}
+# Active websocket connections, grouped by chat_id
+hub = ChatHub(queue_size=CHAT_SEND_QUEUE_SIZE, send_timeout=CHAT_SEND_TIMEOUT_SECONDS)
+
+# Coalesces message inserts; started with the app
+message_writer = MessageWriter(max_batch=MESSAGE_BATCH_SIZE, linger=MESSAGE_BATCH_LINGER_MS / 1000)
+
+# Chat history page sizes
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+EXPORT_BATCH_SIZE = 500
+
+# Stored documents -> response shapes
+message_mapper = DocumentMapper(MessageResponse)
+chat_mapper = DocumentMapper(ChatResponse, nested={"last_message": message_mapper})
+MESSAGE_PROJECTION = message_mapper.projection
+
+async def get_participant_chat(chat_id: str, db, current_user) -> dict:
+    chat = await db.chats.find_one({"_id": ObjectId(chat_id)}, {"participants": 1})
+    if not chat or str(current_user["_id"]) not in chat["participants"]:
+        raise HTTPException(status_code=403, detail="Not a participant of this chat")
+    return chat
+
+async def store_message(chat_id: str, message: MessageCreate, current_user) -> dict:
+    # Shared by the REST and WebSocket paths: persist, then broadcast
+    message_dict = message.dict()
+    message_dict["chat_id"] = chat_id
+    message_dict["sender_id"] = str(current_user["_id"])
+    message_dict["created_at"] = utc_now_ms()
+
+    # Resolves once the batch holding this message is acknowledged, so
+    # sockets only ever see stored messages
+    created_message = message_mapper(await message_writer.write(message_dict))
+
+    # Notify participants through WebSocket if connected
+    await hub.broadcast(chat_id, message_to_json(created_message))
+    return created_message
+
+def message_to_json(msg: dict) -> str:
+    # Takes a message already mapped to MessageResponse
+    return json.dumps({**msg, "created_at": msg["created_at"].isoformat()})
 
 @router.post("/chats/", response_model=ChatResponse)
 async def create_chat(
     chat: ChatCreate,
     db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     # Ensure current user is in participants
     if str(current_user["_id"]) not in chat.participants:
         chat.participants.append(str(current_user["_id"]))
     
     chat_dict = chat.dict()
-    chat_dict["created_at"] = datetime.utcnow()
+    chat_dict["created_at"] = utc_now_ms()
     
-    result = await db.chats.insert_one(chat_dict)
-    created_chat = await db.chats.find_one({"_id": result.inserted_id})
-    created_chat["id"] = str(created_chat["_id"])
-    
-    return created_chat
+    # insert_one sets _id on chat_dict, which is exactly what was stored
+    await db.chats.insert_one(chat_dict)
+    return FastJSONResponse(chat_mapper(chat_dict))
 
 @router.get("/chats/", response_model=List[ChatResponse])
 async def get_my_chats(
-    db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db = Depends(get_list_db),
+    current_user = Depends(get_current_principal)
 ):
-    chats = []
-    cursor = db.chats.find({"participants": str(current_user["_id"])})
-    
-    async for chat in cursor:
-        chat["id"] = str(chat["_id"])
-        # Get last message
-        last_message = await db.messages.find_one(
-            {"chat_id": chat["id"]},
-            sort=[("created_at", -1)]
-        )
-        if last_message:
-            last_message["id"] = str(last_message["_id"])
-            chat["last_message"] = last_message
-        chats.append(chat)
-    
-    return chats
+    # One round trip: join each chat with its newest message server-side,
+    # served by the messages(chat_id, created_at) index
+    pipeline = [
+        {"$match": {"participants": str(current_user["_id"])}},
+        {"$project": chat_mapper.projection},
+        {"$lookup": {
+            "from": "messages",
+            "let": {"chat_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$chat_id", "$$chat_id"]}}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": 1},
+                {"$project": MESSAGE_PROJECTION},
+            ],
+            "as": "last_message",
+        }},
+        {"$addFields": {"last_message": {"$arrayElemAt": ["$last_message", 0]}}},
+    ]
+
+    chats = [chat_mapper(chat) async for chat in db.chats.aggregate(pipeline)]
+    return FastJSONResponse(chats)
 
 @router.get("/chats/{chat_id}/messages", response_model=List[MessageResponse])
 async def get_chat_messages(
     chat_id: str,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
     db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
-    # Verify user is participant
-    chat = await db.chats.find_one({"_id": ObjectId(chat_id)})
-    if not chat or str(current_user["_id"]) not in chat["participants"]:
-        raise HTTPException(status_code=403, detail="Not a participant of this chat")
-    
-    messages = []
-    cursor = db.messages.find({"chat_id": chat_id}).sort("created_at", 1)
-    async for msg in cursor:
-        msg["id"] = str(msg["_id"])
-        messages.append(msg)
-    
-    return messages
+    # Keyset pagination over messages(chat_id, created_at, _id). Without a
+    # cursor this returns the newest page; `before`/`after` take a message id.
+    # Pages are always returned oldest first.
+    await get_participant_chat(chat_id, db, current_user)
+
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    query = {"chat_id": chat_id}
+    anchor_id = before or after
+    if anchor_id:
+        if not ObjectId.is_valid(anchor_id):
+            raise HTTPException(status_code=400, detail="Invalid message cursor")
+        anchor = await db.messages.find_one(
+            {"_id": ObjectId(anchor_id), "chat_id": chat_id},
+            {"created_at": 1}
+        )
+        if not anchor:
+            raise HTTPException(status_code=404, detail="Message not found")
+
+        op = "$gt" if after else "$lt"
+        query["$or"] = [
+            {"created_at": {op: anchor["created_at"]}},
+            {"created_at": anchor["created_at"], "_id": {op: anchor["_id"]}},
+        ]
+
+    direction = 1 if after else -1
+    cursor = db.messages.find(query, MESSAGE_PROJECTION).sort([("created_at", direction), ("_id", direction)]).limit(limit)
+    messages = await cursor.to_list(length=limit)
+    if direction == -1:
+        messages.reverse()
+
+    return FastJSONResponse(message_mapper.many(messages))
+
+@router.get("/chats/{chat_id}/messages/export")
+async def export_chat_messages(
+    chat_id: str,
+    db = Depends(get_db),
+    current_user = Depends(get_current_principal)
+):
+    # Stream the full history as NDJSON, one batch in memory at a time
+    await get_participant_chat(chat_id, db, current_user)
+
+    async def generate():
+        cursor = db.messages.find({"chat_id": chat_id}, MESSAGE_PROJECTION).sort([("created_at", 1), ("_id", 1)])
+        async for msg in cursor.batch_size(EXPORT_BATCH_SIZE):
+            yield message_to_json(message_mapper(msg)) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="chat-{chat_id}.ndjson"'}
+    )
 
 @router.post("/chats/{chat_id}/messages", response_model=MessageResponse)
 async def create_message(
     chat_id: str,
     message: MessageCreate,
     db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     # Verify user is participant
-    chat = await db.chats.find_one({"_id": ObjectId(chat_id)})
-    if not chat or str(current_user["_id"]) not in chat["participants"]:
-        raise HTTPException(status_code=403, detail="Not a participant of this chat")
-    
-    message_dict = message.dict()
-    message_dict["created_at"] = datetime.utcnow()
-    message_dict["sender_id"] = str(current_user["_id"])
+    await get_participant_chat(chat_id, db, current_user)
     
-    result = await db.messages.insert_one(message_dict)
-    created_message = await db.messages.find_one({"_id": result.inserted_id})
-    created_message["id"] = str(created_message["_id"])
-    
-    # Notify participants through WebSocket if connected
-    if chat_id in active_connections:
-        for ws in active_connections[chat_id]:
-            try:
-                await ws.send_json(created_message)
-            except:
-                # Remove dead connections
-                active_connections[chat_id].remove(ws)
-    
-    return created_message
+    return FastJSONResponse(await store_message(chat_id, message, current_user))
 
 @router.websocket("/ws/chat/{chat_id}")
-async def websocket_endpoint(websocket: WebSocket, chat_id: str, db = Depends(get_db)):
+async def websocket_endpoint(websocket: WebSocket, chat_id: str, token: Optional[str] = None, db = Depends(get_db)):
+    # Browsers can't set headers on WebSocket handshakes, so the access
+    # token comes in the query string and is checked once per connection
+    try:
+        if not token:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
+        current_user = await authenticate_principal(token)
+        await get_participant_chat(chat_id, db, current_user)
+    except Exception:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
     await websocket.accept()
-    
-    # Add to active connections
-    if chat_id not in active_connections:
-        active_connections[chat_id] = []
-    active_connections[chat_id].append(websocket)
+    conn = hub.connect(chat_id, websocket)
     
     try:
         while True:
             data = await websocket.receive_text()
-            # Simply echo back the message to all participants
-            if chat_id in active_connections:
-                for ws in active_connections[chat_id]:
-                    if ws != websocket:  # Don't send back to sender
-                        try:
-                            await ws.send_text(data)
-                        except:
-                            active_connections[chat_id].remove(ws)
+            try:
+                payload = json.loads(data)
+                message = MessageCreate(**{
+                    **payload,
+                    "chat_id": chat_id,
+                    "sender_id": str(current_user["_id"]),
+                })
+            except (ValueError, TypeError, ValidationError):
+                hub.send(conn, {"type": "error", "detail": "Invalid message payload"})
+                continue
+
+            # The stored message is broadcast to the whole room, sender
+            # included, which doubles as the delivery acknowledgement
+            try:
+                await store_message(chat_id, message, current_user)
+            except Exception:
+                hub.send(conn, {"type": "error", "detail": "Message could not be stored"})
     except WebSocketDisconnect:
-        if chat_id in active_connections:
-            active_connections[chat_id].remove(websocket)
-            if not active_connections[chat_id]:
-                del active_connections[chat_id]
+        pass
+    finally:
+        hub.disconnect(conn)
@@ -1,54 +1,281 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from bson import ObjectId
+from collections import Counter
 from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import asyncio
+import json
+import logging
 
-from dependencies import get_current_user, get_db
-from models.notification import NotificationCreate, NotificationResponse
+from dependencies import authenticate_principal, get_current_principal, get_db, get_list_db
+from models.notification import NotificationCreate, NotificationReadRequest, NotificationResponse
+from services.notification_bus import NotificationBus
+from services.mapping import DocumentMapper
+from services.responses import FastJSONResponse
+from services.timestamps import utc_now_ms
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Live push streams, keyed by recipient id
+bus = NotificationBus()
+
+# Notification list paging
+NOTIFICATION_PAGE_SIZE = 50
+MAX_NOTIFICATION_PAGE_SIZE = 200
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Stored notification -> NotificationResponse, fetching only the fields it needs
+notification_mapper = DocumentMapper(NotificationResponse)
+NOTIFICATION_PROJECTION = notification_mapper.projection
+
+# Comment line sent on idle streams so proxies keep them open
+STREAM_KEEPALIVE_SECONDS = 15
+
+def notification_to_json(doc: dict) -> str:
+    notification = notification_mapper(doc)
+    return json.dumps({**notification, "created_at": notification["created_at"].isoformat()})
+
+async def deliver_notifications(db, notifications: List[dict]):
+    # Single place notifications are stored, so every insert is pushed
+    if not notifications:
+        return
+
+    error = None
+    try:
+        await db.notifications.insert_many(notifications, ordered=False)
+    except BulkWriteError as e:
+        # Duplicates (already-delivered fan-out on a retry) are expected;
+        # count and push whatever did get stored, then surface anything else
+        write_errors = e.details.get("writeErrors", [])
+        failed = {err["index"] for err in write_errors}
+        notifications = [doc for index, doc in enumerate(notifications) if index not in failed]
+        if any(err.get("code") != DUPLICATE_KEY_ERROR for err in write_errors):
+            error = e
+    if not notifications:
+        if error:
+            raise error
+        return
+
+    # Bump every recipient's unread counter in one round trip
+    per_recipient = Counter(doc["recipient_id"] for doc in notifications)
+    await db.notification_counters.bulk_write([
+        UpdateOne({"_id": recipient_id}, {"$inc": {"unread": count}}, upsert=True)
+        for recipient_id, count in per_recipient.items()
+    ], ordered=False)
+
+    for doc in notifications:
+        await bus.publish(doc["recipient_id"], notification_to_json(doc))
+
+    if error:
+        raise error
+
+async def adjust_unread(db, recipient_id: str, delta: int):
+    if delta:
+        await db.notification_counters.update_one(
+            {"_id": recipient_id},
+            {"$inc": {"unread": delta}},
+            upsert=True
+        )
+
+def parse_since(since: Optional[str]) -> Optional[ObjectId]:
+    if not since:
+        return None
+    if not ObjectId.is_valid(since):
+        raise HTTPException(status_code=400, detail="Invalid notification cursor")
+    return ObjectId(since)
+
 @router.post("/notifications/", response_model=NotificationResponse)
 async def create_notification(
     notification: NotificationCreate,
     db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
     notification_dict = notification.dict()
-    notification_dict["created_at"] = datetime.utcnow()
+    notification_dict["created_at"] = utc_now_ms()
     notification_dict["read"] = False
     
-    result = await db.notifications.insert_one(notification_dict)
-    
-    created_notification = await db.notifications.find_one({"_id": result.inserted_id})
-    created_notification["id"] = str(created_notification["_id"])
-    
-    return created_notification
+    # insert_many sets _id on notification_dict, so there's nothing to re-read
+    await deliver_notifications(db, [notification_dict])
+    return FastJSONResponse(notification_mapper(notification_dict))
 
 @router.get("/me/", response_model=List[NotificationResponse])
 async def get_my_notifications(
-    db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=MAX_NOTIFICATION_PAGE_SIZE),
+    db = Depends(get_list_db),
+    current_user = Depends(get_current_principal)
 ):
+    # Newest first, older pages through `before`. `since` takes the id of
+    # the newest notification the client already has and returns what
+    # arrived after it, oldest first so a gap larger than one page can't
+    # lose its older part. Either way, when the page is full X-Next-Cursor
+    # is the `since` or `before` for the next one.
+    since_id, before_id = parse_since(since), parse_since(before)
+    if since_id and before_id:
+        raise HTTPException(status_code=400, detail="Use either since or before")
+    query = {"recipient_id": str(current_user["_id"])}
+    if since_id:
+        query["_id"] = {"$gt": since_id}
+    elif before_id:
+        query["_id"] = {"$lt": before_id}
+
     notifications = []
-    cursor = db.notifications.find({"recipient_id": str(current_user["_id"])})
+    cursor = db.notifications.find(query, NOTIFICATION_PROJECTION).sort("_id", 1 if since_id else -1).limit(limit)
     async for doc in cursor:
-        doc["id"] = str(doc["_id"])
-        notifications.append(doc)
-    return notifications
+        notifications.append(notification_mapper(doc))
+
+    headers = {}
+    if len(notifications) == limit:
+        headers["X-Next-Cursor"] = notifications[-1]["id"]
+    return FastJSONResponse(notifications, headers=headers)
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None,
+    since: Optional[str] = None,
+    db = Depends(get_db)
+):
+    # Server-sent events. EventSource can't set headers, so the access token
+    # comes in the query string; on reconnect the browser sends
+    # Last-Event-ID, which replays anything missed while disconnected.
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing token")
+    current_user = await authenticate_principal(token)
+    recipient_id = str(current_user["_id"])
+    since_id = parse_since(request.headers.get("last-event-id") or since)
+
+    async def events():
+        # Subscribed before replaying so nothing slips between the two;
+        # anything queued that the replay already covered is skipped below.
+        # Inside the generator, so a client gone before the first chunk
+        # never leaves a queue behind.
+        queue = bus.subscribe(recipient_id)
+        last_id = since_id
+        try:
+            # Replay the whole gap, a page at a time
+            while last_id:
+                cursor = db.notifications.find(
+                    {"recipient_id": recipient_id, "_id": {"$gt": last_id}},
+                    NOTIFICATION_PROJECTION
+                ).sort("_id", 1).limit(MAX_NOTIFICATION_PAGE_SIZE)
+                replayed = 0
+                async for doc in cursor:
+                    replayed += 1
+                    last_id = doc["_id"]
+                    yield f"id: {doc['_id']}\nevent: notification\ndata: {notification_to_json(doc)}\n\n"
+                if replayed < MAX_NOTIFICATION_PAGE_SIZE:
+                    break
+
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                notification_id = json.loads(data)["id"]
+                if last_id and ObjectId(notification_id) <= last_id:
+                    continue
+                yield f"id: {notification_id}\nevent: notification\ndata: {data}\n\n"
+        finally:
+            bus.unsubscribe(recipient_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/me/unread-count")
+async def get_unread_count(
+    db = Depends(get_db),
+    current_user = Depends(get_current_principal)
+):
+    counter = await db.notification_counters.find_one({"_id": str(current_user["_id"])})
+    return {"unread": counter["unread"] if counter else 0}
+
+@router.put("/read")
+async def mark_notifications_as_read(
+    request: NotificationReadRequest,
+    db = Depends(get_db),
+    current_user = Depends(get_current_principal)
+):
+    # Bulk mark-read by id list, or everything up to a cursor, in one update
+    recipient_id = str(current_user["_id"])
+    query = {"recipient_id": recipient_id, "read": False}
+    if request.ids is not None:
+        if not all(ObjectId.is_valid(i) for i in request.ids):
+            raise HTTPException(status_code=400, detail="Invalid notification id")
+        query["_id"] = {"$in": [ObjectId(i) for i in request.ids]}
+    elif request.up_to is not None:
+        query["_id"] = {"$lte": parse_since(request.up_to)}
+    else:
+        raise HTTPException(status_code=400, detail="Provide ids or up_to")
+
+    result = await db.notifications.update_many(
+        query,
+        {"$set": {"read": True, "read_at": datetime.utcnow()}}
+    )
+    await adjust_unread(db, recipient_id, -result.modified_count)
+
+    return {"updated": result.modified_count}
 
 @router.put("/notifications/{notification_id}/read")
 async def mark_notification_as_read(
     notification_id: str,
     db = Depends(get_db),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_principal)
 ):
+    recipient_id = str(current_user["_id"])
     result = await db.notifications.update_one(
-        {"_id": ObjectId(notification_id), "recipient_id": str(current_user["_id"])},
-        {"$set": {"read": True}}
+        {"_id": ObjectId(notification_id), "recipient_id": recipient_id, "read": False},
+        {"$set": {"read": True, "read_at": datetime.utcnow()}}
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Notification not found")
+
+    await adjust_unread(db, recipient_id, -1)
     
     return {"message": "Notification marked as read"}
+
+async def reconcile_unread_counters(db):
+    # Delivery stores notifications and bumps counters in separate writes,
+    # so a failure between the two leaves a counter off; this recounts and
+    # repairs them, and seeds counters for notifications stored before
+    # counters existed. Safe to run at any time: counters are read before
+    # the recount and each repair only applies if the counter hasn't moved
+    # since, so one racing a delivery or mark-read is left to the next run.
+    observed = {}
+    async for counter in db.notification_counters.find({}, {"unread": 1}):
+        observed[counter["_id"]] = counter.get("unread", 0)
+
+    unread = {}
+    async for row in db.notifications.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$recipient_id", "unread": {"$sum": 1}}}
+    ]):
+        unread[row["_id"]] = row["unread"]
+
+    repairs = []
+    for recipient_id, count in unread.items():
+        if recipient_id not in observed:
+            repairs.append(UpdateOne({"_id": recipient_id}, {"$setOnInsert": {"unread": count}}, upsert=True))
+        elif observed[recipient_id] != count:
+            repairs.append(UpdateOne({"_id": recipient_id, "unread": observed[recipient_id]}, {"$set": {"unread": count}}))
+    for recipient_id, count in observed.items():
+        if count and recipient_id not in unread:
+            repairs.append(UpdateOne({"_id": recipient_id, "unread": count}, {"$set": {"unread": 0}}))
+
+    if repairs:
+        result = await db.notification_counters.bulk_write(repairs, ordered=False)
+        logger.info(f"Repaired {result.modified_count + result.upserted_count} of {len(repairs)} drifted unread counters")
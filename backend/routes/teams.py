@@ -1,12 +1,59 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import List, Optional
 from datetime import datetime
 from bson import ObjectId
-from models.team import TeamCreate, TeamUpdate, TeamResponse
-from dependencies import get_current_user, get_db
+from pymongo import ReturnDocument
+import base64
+import json
+import logging
+from models.team import TeamCreate, TeamUpdate, TeamResponse, TeamRecommendation
+from dependencies import get_current_principal, get_current_user, get_db, get_list_db, job_queue, FANOUT_CHUNK_SIZE, FANOUT_MAX_PER_RECIPIENT_PER_HOUR
+from routes.notifications import deliver_notifications
+from services.rate_limiter import RecipientRateLimiter
+from services.mapping import DocumentMapper
+from services.responses import FastJSONResponse
+from services.timestamps import utc_now_ms
+from services.team_recommender import TeamRecommender, team_record
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Discovery paging
+TEAM_PAGE_SIZE = 50
+MAX_TEAM_PAGE_SIZE = 100
+
+# sort option -> (field, direction); _id breaks ties in the same direction
+TEAM_SORTS = {
+    "newest": ("created_at", -1),
+    "oldest": ("created_at", 1),
+    "recently_updated": ("updated_at", -1),
+}
+
+MAX_RECOMMENDATIONS = 50
+
+# Array snapshot of teams for recommendations; loaded at startup and kept
+# current by the write routes below
+recommender = TeamRecommender()
+
+# Caps how many "new team" alerts one player gets per hour
+fanout_limiter = RecipientRateLimiter(max_events=FANOUT_MAX_PER_RECIPIENT_PER_HOUR, window_seconds=3600)
+
+# Stored team -> TeamResponse, fetching only the fields it needs
+team_mapper = DocumentMapper(TeamResponse)
+TEAM_PROJECTION = team_mapper.projection
+
+def encode_team_cursor(team: dict, field: str) -> str:
+    raw = json.dumps([team[field].isoformat(), str(team["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_team_cursor(cursor: str):
+    try:
+        value, team_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(value), ObjectId(team_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.post("/", response_model=TeamResponse)
 async def create_team(
     team: TeamCreate,
@@ -16,136 +63,249 @@ async def create_team(
     team_dict = team.dict()
     team_dict["leader_id"] = str(current_user["_id"])
     team_dict["members"] = [str(current_user["_id"])]
-    team_dict["created_at"] = datetime.utcnow()
-    team_dict["updated_at"] = datetime.utcnow()
+    # Maintained on every join/leave so capacity checks can use an index
+    team_dict["member_count"] = 1
+    team_dict["open_slots"] = team.max_members - 1
+    team_dict["created_at"] = team_dict["updated_at"] = utc_now_ms()
     
-    result = await db.teams.insert_one(team_dict)
-    created_team = await db.teams.find_one({"_id": result.inserted_id})
-    created_team["id"] = str(created_team["_id"])
+    await db.teams.insert_one(team_dict)
+    team_dict["id"] = str(team_dict["_id"])
+    await recommender.publish("upsert", team=team_record(team_dict, current_user.get("play_style")))
     
-    # Find users with similar interests and notify them
-    similar_users = await db.users.find({
-        "_id": {"$ne": current_user["_id"]},
-        "$or": [
-            {"interests.games": team.game},
-            {"interests.skill_level": team.skill_level}
-        ]
-    }).to_list(length=10)
+    # Notifying players with similar interests happens in the background
+    job_queue.enqueue("similar_interest_fanout", notify_similar_players, db, team_dict, set())
     
-    # Create notifications for similar users
-    notifications = []
-    for user in similar_users:
-        notification = {
-            "recipient_id": str(user["_id"]),
+    return FastJSONResponse(team_mapper(team_dict))
+
+async def notify_similar_players(db, team: dict, admitted: set):
+    # Players who play this game at this skill level, streamed off the
+    # users(games, skill_level) index and inserted in chunks. Retries are
+    # safe: the partial unique index on (recipient_id, team_id, type)
+    # drops duplicates, and `admitted` remembers who already passed the
+    # rate limit on an earlier attempt.
+    cursor = db.users.find(
+        {
+            "_id": {"$ne": ObjectId(team["leader_id"])},
+            "games": team["game"],
+            "skill_level": team["skill_level"]
+        },
+        {"_id": 1}
+    ).batch_size(FANOUT_CHUNK_SIZE)
+
+    chunk = []
+    async for user in cursor:
+        recipient_id = str(user["_id"])
+        if recipient_id not in admitted:
+            if not fanout_limiter.allow(recipient_id):
+                continue
+            admitted.add(recipient_id)
+
+        chunk.append({
+            "recipient_id": recipient_id,
             "type": "similar_interest",
-            "title": f"New Team Alert: {team.name}",
-            "message": f"A new team playing {team.game} at {team.skill_level} skill level is looking for members!",
-            "team_id": str(created_team["id"]),
-            "sender_id": str(current_user["_id"]),
+            "title": f"New Team Alert: {team['name']}",
+            "message": f"A new team playing {team['game']} at {team['skill_level']} skill level is looking for members!",
+            "team_id": team["id"],
+            "sender_id": team["leader_id"],
             "created_at": datetime.utcnow(),
             "read": False
-        }
-        notifications.append(notification)
-    
-    if notifications:
-        await db.notifications.insert_many(notifications)
-    
-    return created_team
+        })
+        if len(chunk) >= FANOUT_CHUNK_SIZE:
+            await deliver_notifications(db, chunk)
+            chunk = []
+
+    await deliver_notifications(db, chunk)
 
 @router.get("/", response_model=List[TeamResponse])
-async def list_teams(game: str = None, skill_level: str = None, db = Depends(get_db)):
+async def list_teams(
+    game: str = None,
+    skill_level: str = None,
+    has_open_slots: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    sort: str = Query("newest", pattern="^(" + "|".join(TEAM_SORTS) + ")$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(TEAM_PAGE_SIZE, ge=1, le=MAX_TEAM_PAGE_SIZE),
+    db = Depends(get_list_db)
+):
+    # Keyset-paginated discovery. The cursor for the next page is returned
+    # in the X-Next-Cursor header and is only valid with the same sort.
     query = {}
     if game:
         query["game"] = game
     if skill_level:
         query["skill_level"] = skill_level
-        
-    teams = await db.teams.find(query).to_list(length=50)
+    if has_open_slots is not None:
+        query["open_slots"] = {"$gt": 0} if has_open_slots else {"$lte": 0}
+
+    for field, after, before in (
+        ("created_at", created_after, created_before),
+        ("updated_at", updated_after, updated_before),
+    ):
+        if after or before:
+            query[field] = {}
+            if after:
+                query[field]["$gte"] = after
+            if before:
+                query[field]["$lt"] = before
+
+    field, direction = TEAM_SORTS[sort]
+    if cursor:
+        value, last_id = decode_team_cursor(cursor)
+        op = "$gt" if direction == 1 else "$lt"
+        query["$or"] = [
+            {field: {op: value}},
+            {field: value, "_id": {op: last_id}},
+        ]
+
+    teams = await db.teams.find(query, TEAM_PROJECTION) \
+        .sort([(field, direction), ("_id", direction)]) \
+        .limit(limit) \
+        .to_list(length=limit)
+
+    headers = {}
+    if len(teams) == limit:
+        headers["X-Next-Cursor"] = encode_team_cursor(teams[-1], field)
+    return FastJSONResponse(team_mapper.many(teams), headers=headers)
+
+@router.get("/recommended", response_model=List[TeamRecommendation])
+async def recommended_teams(
+    limit: int = Query(10, ge=1, le=MAX_RECOMMENDATIONS),
+    current_user: dict = Depends(get_current_user),
+    db = Depends(get_list_db)
+):
+    # Open teams ranked against the caller's games, skill and play style,
+    # favouring emptier and newer teams. The snapshot doesn't know
+    # memberships, so over-fetch to make up for teams the caller is in.
+    ranked = recommender.recommend(current_user, limit=limit * 2)
+    if not ranked:
+        return []
+    scores = dict(ranked)
+    user_id = str(current_user["_id"])
+
+    teams = await db.teams.find(
+        {"_id": {"$in": [ObjectId(team_id) for team_id in scores]}, "members": {"$ne": user_id}},
+        TEAM_PROJECTION
+    ).to_list(length=len(scores))
+    recommendations = []
     for team in teams:
-        team["id"] = str(team["_id"])
-    return teams
+        recommendation = team_mapper(team)
+        recommendation["score"] = scores[recommendation["id"]]
+        recommendations.append(recommendation)
+    recommendations.sort(key=lambda team: team["score"], reverse=True)
+    return FastJSONResponse(recommendations[:limit])
 
 @router.get("/{team_id}", response_model=TeamResponse)
 async def get_team(team_id: str, db = Depends(get_db)):
-    team = await db.teams.find_one({"_id": ObjectId(team_id)})
+    team = await db.teams.find_one({"_id": ObjectId(team_id)}, TEAM_PROJECTION)
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
-    team["id"] = str(team["_id"])
-    return team
+    return FastJSONResponse(team_mapper(team))
 
 @router.post("/{team_id}/join")
-async def join_team(team_id: str, current_user: dict = Depends(get_current_user), db = Depends(get_db)):
-    team = await db.teams.find_one({"_id": ObjectId(team_id)})
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-        
+async def join_team(team_id: str, current_user: dict = Depends(get_current_principal), db = Depends(get_db)):
+    # Membership and capacity are checked in the update filter, so
+    # concurrent joins can't overfill the team
     user_id = str(current_user["_id"])
-    if user_id in team["members"]:
-        raise HTTPException(status_code=400, detail="Already a member of this team")
-        
-    if len(team["members"]) >= team["max_members"]:
-        raise HTTPException(status_code=400, detail="Team is full")
-        
-    await db.teams.update_one(
-        {"_id": ObjectId(team_id)},
+    result = await db.teams.find_one_and_update(
         {
-            "$push": {"members": user_id},
+            "_id": ObjectId(team_id),
+            "members": {"$ne": user_id},
+            "open_slots": {"$gt": 0}
+        },
+        {
+            "$addToSet": {"members": user_id},
+            "$inc": {"member_count": 1, "open_slots": -1},
             "$set": {"updated_at": datetime.utcnow()}
-        }
+        },
+        projection={"open_slots": 1},
+        return_document=ReturnDocument.AFTER
     )
+
+    if result is None:
+        # Only the failure path pays for a read, to report why
+        team = await db.teams.find_one({"_id": ObjectId(team_id)}, {"members": 1})
+        if not team:
+            raise HTTPException(status_code=404, detail="Team not found")
+        if user_id in team["members"]:
+            raise HTTPException(status_code=400, detail="Already a member of this team")
+        raise HTTPException(status_code=400, detail="Team is full")
+
+    await recommender.publish("slots", id=team_id, open_slots=result["open_slots"])
     return {"message": "Successfully joined team"}
 
 @router.post("/{team_id}/leave")
-async def leave_team(team_id: str, current_user: dict = Depends(get_current_user), db = Depends(get_db)):
-    team = await db.teams.find_one({"_id": ObjectId(team_id)})
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-        
+async def leave_team(team_id: str, current_user: dict = Depends(get_current_principal), db = Depends(get_db)):
     user_id = str(current_user["_id"])
-    if user_id not in team["members"]:
-        raise HTTPException(status_code=400, detail="Not a member of this team")
-        
-    if user_id == team["leader_id"]:
-        raise HTTPException(status_code=400, detail="Team leader cannot leave. Transfer leadership first.")
-        
-    await db.teams.update_one(
-        {"_id": ObjectId(team_id)},
+    result = await db.teams.find_one_and_update(
+        {"_id": ObjectId(team_id), "members": user_id, "leader_id": {"$ne": user_id}},
         {
             "$pull": {"members": user_id},
+            "$inc": {"member_count": -1, "open_slots": 1},
             "$set": {"updated_at": datetime.utcnow()}
-        }
+        },
+        projection={"open_slots": 1},
+        return_document=ReturnDocument.AFTER
     )
+
+    if result is None:
+        team = await db.teams.find_one({"_id": ObjectId(team_id)}, {"members": 1, "leader_id": 1})
+        if not team:
+            raise HTTPException(status_code=404, detail="Team not found")
+        if user_id not in team["members"]:
+            raise HTTPException(status_code=400, detail="Not a member of this team")
+        raise HTTPException(status_code=400, detail="Team leader cannot leave. Transfer leadership first.")
+
+    await recommender.publish("slots", id=team_id, open_slots=result["open_slots"])
     return {"message": "Successfully left team"}
 
 @router.put("/{team_id}", response_model=TeamResponse)
 async def update_team(
     team_id: str,
     team_update: TeamUpdate,
-    current_user: dict = Depends(get_current_user),
+    current_user: dict = Depends(get_current_principal),
     db = Depends(get_db)
 ):
-    team = await db.teams.find_one({"_id": ObjectId(team_id)})
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-        
-    if str(current_user["_id"]) != team["leader_id"]:
-        raise HTTPException(status_code=403, detail="Only team leader can update team")
-        
+    # The leader check is part of the update filter, and the updated team
+    # comes back from the same round trip
+    leader_filter = {"_id": ObjectId(team_id), "leader_id": str(current_user["_id"])}
     update_data = {k: v for k, v in team_update.dict(exclude_unset=True).items()}
     if update_data:
         update_data["updated_at"] = datetime.utcnow()
-        await db.teams.update_one(
-            {"_id": ObjectId(team_id)},
-            {"$set": update_data}
+        if "max_members" in update_data:
+            # Recompute open_slots from the stored member_count in the same
+            # atomic update; $literal keeps user values from being read as
+            # field paths inside the pipeline
+            update = [
+                {"$set": {k: {"$literal": v} for k, v in update_data.items()}},
+                {"$set": {"open_slots": {"$subtract": ["$max_members", "$member_count"]}}}
+            ]
+        else:
+            update = {"$set": update_data}
+        updated_team = await db.teams.find_one_and_update(
+            leader_filter,
+            update,
+            # open_slots is for the recommender; the mapper drops it
+            projection={**TEAM_PROJECTION, "open_slots": 1},
+            return_document=ReturnDocument.AFTER
         )
-        
-    updated_team = await db.teams.find_one({"_id": ObjectId(team_id)})
-    updated_team["id"] = str(updated_team["_id"])
-    return updated_team
+    else:
+        updated_team = await db.teams.find_one(leader_filter, TEAM_PROJECTION)
+
+    if updated_team is None:
+        if not await db.teams.find_one({"_id": ObjectId(team_id)}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Team not found")
+        raise HTTPException(status_code=403, detail="Only team leader can update team")
+
+    if update_data:
+        await recommender.publish("upsert", team=team_record(updated_team))
+    return FastJSONResponse(team_mapper(updated_team))
 
 @router.delete("/{team_id}")
-async def delete_team(team_id: str, current_user: dict = Depends(get_current_user), db = Depends(get_db)):
-    team = await db.teams.find_one({"_id": ObjectId(team_id)})
+async def delete_team(team_id: str, current_user: dict = Depends(get_current_principal), db = Depends(get_db)):
+    team = await db.teams.find_one({"_id": ObjectId(team_id)}, {"leader_id": 1})
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
         
@@ -153,4 +313,18 @@ async def delete_team(team_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=403, detail="Only team leader can delete team")
         
     await db.teams.delete_one({"_id": ObjectId(team_id)})
+    await recommender.publish("remove", id=team_id)
     return {"message": "Team successfully deleted"}
+
+async def backfill_team_counters(db):
+    # Teams created before member_count/open_slots existed get them derived
+    # from their members array; a no-op once every team has them
+    result = await db.teams.update_many(
+        {"open_slots": {"$exists": False}},
+        [{"$set": {
+            "member_count": {"$size": "$members"},
+            "open_slots": {"$subtract": ["$max_members", {"$size": "$members"}]}
+        }}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled member counters on {result.modified_count} teams")
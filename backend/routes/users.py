@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+
+from dependencies import get_current_user
+from models.user import PlayerMatch
+from services.matchmaking import MatchmakingIndex
+
+router = APIRouter()
+
+# In-memory player index; loaded at startup and kept current through
+# publish_player
+matchmaking = MatchmakingIndex()
+
+MAX_MATCHES = 50
+
+async def publish_player(user: dict):
+    # Call after any change to a user's games, skill, play style or availability
+    await matchmaking.publish(user)
+
+@router.get("/match", response_model=List[PlayerMatch])
+async def find_matches(
+    game: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=MAX_MATCHES),
+    current_user: dict = Depends(get_current_user)
+):
+    # Ranked by game overlap, skill distance, play style and availability;
+    # `game` narrows candidates to one title, otherwise all of the caller's
+    return matchmaking.find_matches(current_user, game=game, limit=limit)
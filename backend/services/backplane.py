@@ -0,0 +1,212 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Awaitable, Callable, List
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, str], Awaitable[None]]
+
+
+class Backplane(ABC):
+    """Publish/subscribe bus shared by every worker serving the app.
+
+    ``publish(channel, data)`` delivers ``data`` to the handlers subscribed
+    in every process, this one included. Channels are namespaced strings
+    such as ``chat:<chat_id>``; handlers ignore channels they don't own.
+    """
+
+    def __init__(self):
+        self._handlers: List[Handler] = []
+
+    def subscribe(self, handler: Handler):
+        self._handlers.append(handler)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, data: str):
+        ...
+
+    async def _dispatch(self, channel: str, data: str):
+        for handler in self._handlers:
+            try:
+                await handler(channel, data)
+            except Exception as e:
+                logger.error(f"Backplane handler failed for {channel}: {str(e)}")
+
+
+class InMemoryBackplane(Backplane):
+    # Single process: publishing is a direct local dispatch
+    async def publish(self, channel: str, data: str):
+        await self._dispatch(channel, data)
+
+
+class UnixSocketBackplane(Backplane):
+    """Fan-out between workers on one host over Unix datagram sockets.
+
+    Each worker binds ``<socket_dir>/<id>.sock`` and publishes by sending a
+    datagram to every other socket in the directory. Sockets left behind by
+    dead workers are removed the first time a send to them is refused.
+    """
+
+    MAX_DATAGRAM_SIZE = 64 * 1024
+    PEER_REFRESH_SECONDS = 1.0
+
+    def __init__(self, socket_dir: str):
+        super().__init__()
+        self.socket_dir = socket_dir
+        self.path = os.path.join(socket_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self.dropped = 0
+        self._sock = None
+        self._peers: List[str] = []
+        self._peers_refreshed_at = 0.0
+        self._inbox: asyncio.Queue = asyncio.Queue()
+        self._consumer = None
+
+    async def start(self):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self._sock.fileno(), self._on_readable)
+        self._consumer = asyncio.create_task(self._consume())
+        logger.info(f"Unix socket backplane listening on {self.path}")
+
+    async def stop(self):
+        if self._sock is not None:
+            asyncio.get_running_loop().remove_reader(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        if self._consumer is not None:
+            self._consumer.cancel()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def publish(self, channel: str, data: str):
+        await self._dispatch(channel, data)
+
+        payload = json.dumps([channel, data]).encode()
+        if len(payload) > self.MAX_DATAGRAM_SIZE:
+            logger.error(f"Backplane message on {channel} too large to forward ({len(payload)} bytes)")
+            return
+
+        for peer in self._current_peers():
+            try:
+                self._sock.sendto(payload, peer)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_peer(peer)
+            except BlockingIOError:
+                # Peer isn't keeping up; drop rather than block the publisher
+                self.dropped += 1
+
+    def _current_peers(self) -> List[str]:
+        now = time.monotonic()
+        if now - self._peers_refreshed_at >= self.PEER_REFRESH_SECONDS:
+            self._peers = [
+                entry.path for entry in os.scandir(self.socket_dir)
+                if entry.name.endswith(".sock") and entry.path != self.path
+            ]
+            self._peers_refreshed_at = now
+        return self._peers
+
+    def _remove_peer(self, peer: str):
+        if peer in self._peers:
+            self._peers.remove(peer)
+        try:
+            os.unlink(peer)
+        except OSError:
+            pass
+
+    def _on_readable(self):
+        while True:
+            try:
+                payload = self._sock.recv(self.MAX_DATAGRAM_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+            self._inbox.put_nowait(payload)
+
+    async def _consume(self):
+        # Dispatch sequentially so per-channel ordering is preserved
+        while True:
+            payload = await self._inbox.get()
+            try:
+                channel, data = json.loads(payload)
+            except ValueError:
+                logger.warning("Discarding malformed backplane datagram")
+                continue
+            await self._dispatch(channel, data)
+
+
+class MongoChangeStreamBackplane(Backplane):
+    """Fan-out across hosts through a MongoDB change stream.
+
+    Messages are inserted into a short-lived TTL collection and every worker
+    watches it for inserts. Requires a replica set (Atlas clusters are).
+    """
+
+    RETRY_DELAY_SECONDS = 1.0
+
+    def __init__(self, db, collection: str = "backplane_events", ttl_seconds: int = 60):
+        super().__init__()
+        self.collection = db[collection]
+        self.ttl_seconds = ttl_seconds
+        self._watcher = None
+
+    async def start(self):
+        await self.collection.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        ready = asyncio.Event()
+        self._watcher = asyncio.create_task(self._watch(ready))
+        await ready.wait()
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+
+    async def publish(self, channel: str, data: str):
+        await self.collection.insert_one({
+            "channel": channel,
+            "data": data,
+            "created_at": datetime.utcnow()
+        })
+
+    async def _watch(self, ready: asyncio.Event):
+        resume_token = None
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with self.collection.watch(pipeline, resume_after=resume_token) as stream:
+                    ready.set()
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change["fullDocument"]
+                        await self._dispatch(doc["channel"], doc["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Backplane change stream failed, retrying: {str(e)}")
+                ready.set()
+                await asyncio.sleep(self.RETRY_DELAY_SECONDS)
+
+
+def create_backplane(kind: str, db=None, socket_dir: str = None) -> Backplane:
+    if kind == "memory":
+        return InMemoryBackplane()
+    if kind == "unix":
+        return UnixSocketBackplane(socket_dir)
+    if kind == "mongo":
+        return MongoChangeStreamBackplane(db)
+    raise ValueError(f"Unknown backplane: {kind}")
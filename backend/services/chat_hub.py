@@ -0,0 +1,149 @@
+import asyncio
+import itertools
+import json
+import logging
+import uuid
+from typing import Dict, Optional, Set, Union
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to evicted slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Backplane channel prefix for chat rooms
+CHANNEL_PREFIX = "chat:"
+
+
+class ChatConnection:
+    _ids = itertools.count(1)
+
+    def __init__(self, websocket: WebSocket, room: str, queue_size: int, instance_id: str):
+        self.id = next(self._ids)
+        # Unique across workers, so exclusions survive the backplane hop
+        self.key = f"{instance_id}:{self.id}"
+        self.websocket = websocket
+        self.room = room
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.sender: Optional[asyncio.Task] = None
+
+
+class ChatHub:
+    """Room-based WebSocket fan-out.
+
+    Every connection gets a bounded outbound queue drained by its own sender
+    task, so a broadcast only enqueues the (once-serialized) payload and a
+    slow socket never delays the rest of the room. A connection whose queue
+    overflows or whose send stalls past ``send_timeout`` is evicted.
+
+    Once attached to a backplane, broadcasts are published there and every
+    worker fans them out to its own sockets.
+    """
+
+    def __init__(self, queue_size: int = 64, send_timeout: float = 5.0):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.instance_id = uuid.uuid4().hex[:12]
+        self.rooms: Dict[str, Set[ChatConnection]] = {}
+        self.evictions = 0
+        self.backplane = None
+        # Close tasks for evicted sockets; the loop only keeps weak references
+        self._closing: Set[asyncio.Task] = set()
+
+    def attach(self, backplane):
+        self.backplane = backplane
+        backplane.subscribe(self._on_backplane_message)
+
+    def connect(self, room: str, websocket: WebSocket) -> ChatConnection:
+        conn = ChatConnection(websocket, room, self.queue_size, self.instance_id)
+        self.rooms.setdefault(room, set()).add(conn)
+        conn.sender = asyncio.create_task(self._send_loop(conn))
+        return conn
+
+    def disconnect(self, conn: ChatConnection):
+        members = self.rooms.get(conn.room)
+        if members is not None:
+            members.discard(conn)
+            if not members:
+                del self.rooms[conn.room]
+        if conn.sender is not None and conn.sender is not asyncio.current_task():
+            conn.sender.cancel()
+
+    def send(self, conn: ChatConnection, message: Union[str, dict]) -> bool:
+        # Direct replies to one connection (e.g. error frames) go through its
+        # queue too, so they share the sender task, bound and send timeout
+        data = message if isinstance(message, str) else json.dumps(message)
+        try:
+            conn.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            self._evict(conn, "send queue full")
+            return False
+
+    async def broadcast(self, room: str, message: Union[str, dict], exclude: Optional[ChatConnection] = None):
+        data = message if isinstance(message, str) else json.dumps(message)
+        exclude_key = exclude.key if exclude is not None else None
+
+        if self.backplane is None:
+            self._deliver(room, data, exclude_key)
+            return
+
+        envelope = json.dumps({"data": data, "exclude": exclude_key})
+        await self.backplane.publish(CHANNEL_PREFIX + room, envelope)
+
+    async def _on_backplane_message(self, channel: str, envelope: str):
+        if not channel.startswith(CHANNEL_PREFIX):
+            return
+        room = channel[len(CHANNEL_PREFIX):]
+        if room not in self.rooms:
+            return
+        message = json.loads(envelope)
+        self._deliver(room, message["data"], message.get("exclude"))
+
+    def _deliver(self, room: str, data: str, exclude_key: Optional[str] = None) -> int:
+        members = self.rooms.get(room)
+        if not members:
+            return 0
+
+        delivered = 0
+        # Iterate over a snapshot since evictions mutate the room
+        for conn in list(members):
+            if conn.key == exclude_key:
+                continue
+            if self.send(conn, data):
+                delivered += 1
+        return delivered
+
+    async def _send_loop(self, conn: ChatConnection):
+        try:
+            while True:
+                data = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(data), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._evict(conn, "send timed out")
+        except Exception:
+            # Socket already gone; the receive loop will notice as well
+            self.disconnect(conn)
+
+    def _evict(self, conn: ChatConnection, reason: str):
+        self.evictions += 1
+        logger.warning(f"Evicting slow chat connection {conn.id} in room {conn.room}: {reason}")
+        self.disconnect(conn)
+        task = asyncio.create_task(self._close(conn))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close(self, conn: ChatConnection):
+        try:
+            await conn.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "rooms": len(self.rooms),
+            "connections": sum(len(members) for members in self.rooms.values()),
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,152 @@
+import logging
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from dependencies import NOTIFICATION_READ_TTL_DAYS
+
+logger = logging.getLogger(__name__)
+
+# collection name -> indexes the routes rely on
+INDEXES = {
+    "users": [
+        # Token -> principal lookup on every authenticated request, and
+        # the registration check; unique so concurrent sign-ups can't race
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+        IndexModel([("username", ASCENDING)], name="username_1", unique=True),
+        # "New team" fan-out: players by game and skill level
+        IndexModel([("games", ASCENDING), ("skill_level", ASCENDING)], name="games_1_skill_level_1"),
+    ],
+    "chats": [
+        IndexModel([("participants", ASCENDING)], name="participants_1"),
+    ],
+    "teams": [
+        # Discovery: equality filters first, then the sort key and _id
+        # (trailing open_slots lets the open-slots range be checked on index keys)
+        IndexModel([("game", ASCENDING), ("skill_level", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING), ("open_slots", ASCENDING)], name="game_1_skill_level_1_created_at_-1__id_-1_open_slots_1"),
+        IndexModel([("game", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING), ("open_slots", ASCENDING)], name="game_1_created_at_-1__id_-1_open_slots_1"),
+        IndexModel([("game", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="game_1_updated_at_-1__id_-1"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_-1__id_-1"),
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="updated_at_-1__id_-1"),
+        IndexModel([("open_slots", ASCENDING)], name="open_slots_1"),
+    ],
+    "messages": [
+        # Serves history pagination in both directions and the last-message lookup
+        IndexModel([("chat_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)], name="chat_id_1_created_at_1__id_1"),
+    ],
+    "notifications": [
+        # Inbox listing and since=<id> catch-up, newest first
+        IndexModel([("recipient_id", ASCENDING), ("_id", DESCENDING)], name="recipient_id_1__id_-1"),
+        # Only read notifications have read_at, so unread ones never expire
+        IndexModel([("read_at", ASCENDING)], name="read_at_ttl", expireAfterSeconds=NOTIFICATION_READ_TTL_DAYS * 86400),
+        # One "new team" alert per player per team, however often fan-out retries
+        IndexModel(
+            [("recipient_id", ASCENDING), ("team_id", ASCENDING), ("type", ASCENDING)],
+            name="similar_interest_dedup",
+            unique=True,
+            partialFilterExpression={"type": "similar_interest"}
+        ),
+    ],
+    "refresh_tokens": [
+        # One document per token family; gone once its last token has expired
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        # Revoke-all for a user
+        IndexModel([("user_id", ASCENDING)], name="user_id_1"),
+    ],
+    "token_revocations": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# The main query behind each hot route: (label, collection, filter, sort).
+# Values are placeholders; only the shape matters to the planner.
+HOT_QUERIES = [
+    ("auth: token principal", "users", {"email": "probe@example.com"}, None),
+    ("auth: register check", "users", {"$or": [{"email": "probe@example.com"}, {"username": "probe"}]}, None),
+    ("teams: new-team fan-out", "users", {"games": "probe", "skill_level": "beginner"}, None),
+    ("teams: list newest", "teams", {"game": "probe", "skill_level": "beginner", "open_slots": {"$gt": 0}}, [("created_at", -1), ("_id", -1)]),
+    ("teams: list by game", "teams", {"game": "probe"}, [("created_at", -1), ("_id", -1)]),
+    ("teams: recently updated", "teams", {}, [("updated_at", -1), ("_id", -1)]),
+    ("chat: my chats", "chats", {"participants": "probe"}, None),
+    # The $lookup that attaches each chat's last message, in the form it runs
+    ("chat: my chats, last message", "messages", {"$expr": {"$eq": ["$chat_id", "probe"]}}, [("created_at", -1)]),
+    ("chat: history page", "messages", {"chat_id": "probe"}, [("created_at", -1), ("_id", -1)]),
+    ("notifications: inbox", "notifications", {"recipient_id": "probe"}, [("_id", -1)]),
+    ("notifications: unread count", "notification_counters", {"_id": "probe"}, None),
+]
+
+async def ensure_indexes(db):
+    # create_indexes is a no-op for indexes that already exist. Each index
+    # is created on its own so one failure (e.g. existing duplicates under
+    # a unique index) doesn't hold back the rest.
+    for collection, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection].create_indexes([index])
+            except Exception as e:
+                logger.error(f"Failed to create index {index.document['name']} on {collection}: {str(e)}")
+        logger.info(f"Ensured indexes on {collection}: {', '.join(index.document['name'] for index in indexes)}")
+
+def _plan_stages(plan: dict):
+    # Flatten an explain() plan tree into (stage, index name) pairs
+    stages = []
+    if "stage" in plan:
+        stages.append((plan["stage"], plan.get("indexName")))
+    for key in ("queryPlan", "inputStage"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def check_indexes(db) -> bool:
+    """Report missing indexes and the plan of each hot query.
+
+    Returns False if any index is missing or any hot query would scan
+    its whole collection.
+    """
+    healthy = True
+
+    print("Indexes")
+    for collection, indexes in INDEXES.items():
+        existing = {
+            tuple(info["key"]) for info in (await db[collection].index_information()).values()
+        }
+        for index in indexes:
+            present = tuple(index.document["key"].items()) in existing
+            healthy &= present
+            print(f"  {'ok' if present else 'MISSING':8} {collection}.{index.document['name']}")
+
+    print("Query plans")
+    for label, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        stages = _plan_stages(plan)
+        scans = any(stage == "COLLSCAN" for stage, _ in stages)
+        healthy &= not scans
+        used = ", ".join(name for _, name in stages if name) or "no index"
+        print(f"  {'COLLSCAN' if scans else 'ok':8} {label} ({collection}): {' > '.join(stage for stage, _ in stages)} [{used}]")
+
+    return healthy
+
+if __name__ == "__main__":
+    # python -m services.indexes [--check], run from the backend directory
+    import argparse
+    import asyncio
+    import sys
+    import dependencies
+
+    parser = argparse.ArgumentParser(description="Create or check the indexes the routes rely on")
+    parser.add_argument("--check", action="store_true", help="report missing indexes and query plans instead of creating indexes")
+    args = parser.parse_args()
+
+    async def main():
+        await dependencies.connect_to_mongo()
+        try:
+            if args.check:
+                return await check_indexes(dependencies.db)
+            await ensure_indexes(dependencies.db)
+            return True
+        finally:
+            await dependencies.close_mongo_connection()
+
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,99 @@
+import asyncio
+import itertools
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, fn: Callable[..., Awaitable], args: tuple):
+        self.id = next(self._ids)
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.attempts = 0
+
+
+class JobQueue:
+    """In-process background job runner with retries.
+
+    Jobs run on ``workers`` tasks. A job that raises is retried with
+    exponential backoff up to ``max_attempts`` times, so job functions
+    must be safe to run again. Jobs live in memory only and are lost if
+    the process exits. Recurring jobs registered with ``every`` are
+    enqueued on their interval while the queue runs.
+    """
+
+    def __init__(self, workers: int = 2, max_attempts: int = 5, base_delay: float = 0.5, max_size: int = 1000):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._schedules = []
+        self._tasks = []
+
+    def every(self, name: str, seconds: float, fn: Callable[..., Awaitable], *args):
+        # Takes effect on start()
+        self._schedules.append((name, seconds, fn, args))
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks += [asyncio.create_task(self._repeat(*schedule)) for schedule in self._schedules]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def enqueue(self, name: str, fn: Callable[..., Awaitable], *args) -> bool:
+        try:
+            self._queue.put_nowait(Job(name, fn, args))
+            return True
+        except asyncio.QueueFull:
+            logger.error(f"Job queue full, dropping {name}")
+            return False
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            job.attempts += 1
+            try:
+                await job.fn(*job.args)
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job.attempts >= self.max_attempts:
+                    self.failed += 1
+                    logger.error(f"Job {job.name}#{job.id} failed after {job.attempts} attempts: {str(e)}")
+                else:
+                    self.retried += 1
+                    delay = self.base_delay * 2 ** (job.attempts - 1)
+                    logger.warning(f"Job {job.name}#{job.id} failed, retrying in {delay:.1f}s: {str(e)}")
+                    asyncio.get_running_loop().call_later(delay, self._requeue, job)
+
+    async def _repeat(self, name: str, seconds: float, fn: Callable[..., Awaitable], args: tuple):
+        while True:
+            await asyncio.sleep(seconds)
+            self.enqueue(name, fn, *args)
+
+    def _requeue(self, job: Job):
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.failed += 1
+            logger.error(f"Job queue full, dropping retry of {job.name}#{job.id}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
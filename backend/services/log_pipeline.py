@@ -0,0 +1,191 @@
+import atexit
+import json
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# Set per HTTP request by RequestIdMiddleware and stamped on every record
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Incoming X-Request-ID values are reused only if they look like an id
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Caps how many records each logger may emit per second.
+
+    Budgets are looked up by logger name, most specific dotted prefix
+    first, falling back to ``default_per_second``. Records over budget are
+    dropped and counted; the next record that gets through carries the
+    count as ``suppressed``. ERROR and above always pass, so a flood of
+    per-request warnings costs a bounded amount of output however busy the
+    app is, without hiding failures.
+    """
+
+    def __init__(self, default_per_second: float, per_logger: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.default_per_second = default_per_second
+        self.per_logger = per_logger or {}
+        # logger name -> [window start, emitted in window, suppressed]
+        self._windows: Dict[str, list] = {}
+        self._budgets: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, name: str) -> float:
+        budget = self._budgets.get(name)
+        if budget is None:
+            budget = self.default_per_second
+            prefix = name
+            while prefix:
+                if prefix in self.per_logger:
+                    budget = self.per_logger[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._budgets[name] = budget
+        return budget
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        budget = self._budget(record.name)
+        if record.levelno >= logging.ERROR or budget <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(record.name)
+            if window is None:
+                window = self._windows[record.name] = [now, 0, 0]
+            elif now - window[0] >= 1.0:
+                window[0], window[1] = now, 0
+            if window[1] >= budget:
+                window[2] += 1
+                return False
+            window[1] += 1
+            record.suppressed, window[2] = window[2], 0
+        return True
+
+
+class _ContextQueueHandler(QueueHandler):
+    # Runs on the logging thread: stamps the request id, renders the
+    # message and traceback so the record can cross threads, and enqueues.
+    # Formatting to JSON and the write happen on the listener thread.
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", default_per_second: float = 100,
+                  per_logger: Optional[Dict[str, float]] = None):
+    """Route every logger through a queue drained by a background thread.
+
+    Replaces the root logger's handlers, and uvicorn's, with a single
+    QueueHandler; callers only pay for building the record and putting it
+    on the queue, never for the stderr write. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+
+    records = queue.SimpleQueue()
+    handler = _ContextQueueHandler(records)
+    handler.addFilter(SamplingFilter(default_per_second, per_logger))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    # uvicorn installs its own stream handlers; send its records (including
+    # the per-request access log) through the queue as well
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    # "routes.auth=5,dependencies=10" -> {"routes.auth": 5.0, "dependencies": 10.0}
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+class RequestIdMiddleware:
+    """Gives each HTTP request an id for its log records.
+
+    Reuses a well-formed incoming ``X-Request-ID`` (so ids can follow a
+    request across services) or generates one, and echoes it back on the
+    response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                incoming = value.decode("latin-1")
+                break
+        rid = incoming if incoming and _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode())]
+            await send(message)
+
+        token = request_id.set(rid)
+        try:
+            await self.app(scope, receive, send_wrapper if scope["type"] == "http" else send)
+        finally:
+            request_id.reset(token)
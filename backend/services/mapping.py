@@ -0,0 +1,49 @@
+import typing
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+
+def _model_type(annotation) -> Optional[type]:
+    # MessageResponse, Optional[MessageResponse] -> MessageResponse
+    for candidate in (annotation, *typing.get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+class DocumentMapper:
+    """Maps stored documents straight to a response model's shape.
+
+    ``projection`` asks Mongo for only the model's fields, and calling the
+    mapper builds the response dict in one pass: ``_id`` becomes ``id``,
+    missing optional fields get the model default, anything else in the
+    document is dropped. The result is meant for FastJSONResponse, so
+    trusted DB output skips response_model validation. Fields holding a
+    nested model are mapped with the mapper given in ``nested`` and left
+    out of the projection, since they don't live on the document itself.
+    """
+
+    def __init__(self, model: typing.Type[BaseModel], nested: Optional[Dict[str, "DocumentMapper"]] = None):
+        self.model = model
+        self.nested = nested or {}
+        self.defaults = {}
+        for name, field in model.model_fields.items():
+            if name == "id":
+                continue
+            if _model_type(field.annotation) and name not in self.nested:
+                raise ValueError(f"{model.__name__}.{name} needs a nested mapper")
+            self.defaults[name] = None if field.is_required() else field.get_default(call_default_factory=True)
+        self.projection = {name: 1 for name in self.defaults if name not in self.nested}
+
+    def __call__(self, doc: dict) -> dict:
+        response = {"id": str(doc["_id"])}
+        for name, default in self.defaults.items():
+            value = doc.get(name, default)
+            if name in self.nested and value is not None:
+                value = self.nested[name](value)
+            response[name] = value
+        return response
+
+    def many(self, docs: Iterable[dict]) -> List[dict]:
+        return [self(doc) for doc in docs]
@@ -0,0 +1,333 @@
+import heapq
+import json
+import logging
+from itertools import combinations
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SKILL_LEVELS = ["beginner", "intermediate", "advanced", "professional"]
+SKILL_INDEX = {level: i for i, level in enumerate(SKILL_LEVELS)}
+MAX_SKILL_DISTANCE = len(SKILL_LEVELS) - 1
+
+# Score weights; a perfect match scores their sum
+GAME_WEIGHT = 0.4
+SKILL_WEIGHT = 0.3
+PLAY_STYLE_WEIGHT = 0.15
+AVAILABILITY_WEIGHT = 0.15
+
+# Players are filed under every combination of up to KEY_GAMES of their
+# games; past MAX_KEYED_GAMES games that would be too many trees, so those
+# players are filed under each game alone, in trees of their own
+KEY_GAMES = 3
+MAX_KEYED_GAMES = 8
+
+# Backplane channel carrying player profile changes
+CHANNEL = "players"
+
+
+def _normalize(values) -> FrozenSet[str]:
+    return frozenset(v.strip().lower() for v in values or [] if v and v.strip())
+
+
+def _popcount(value: int) -> int:
+    return value.bit_count()
+
+
+def _bits_of(mask: int) -> List[int]:
+    bits = []
+    while mask:
+        bit = mask & -mask
+        bits.append(bit)
+        mask ^= bit
+    return bits
+
+
+def _subsets(mask: int, most: int) -> List[int]:
+    # Every non-empty combination of up to `most` of a mask's bits
+    bits = _bits_of(mask)
+    return [sum(combo) for size in range(1, most + 1) for combo in combinations(bits, size)]
+
+
+def _overlap(a: int, b: int) -> float:
+    # Jaccard similarity of two bitmask-encoded sets
+    union = a | b
+    if not a or not b:
+        return 0.0
+    return _popcount(a & b) / _popcount(union)
+
+
+class Player:
+    __slots__ = ("id", "skill", "play_style", "games_mask", "availability_mask", "profile")
+
+    def __init__(self, user: dict, games_mask: int, availability_mask: int):
+        self.id = str(user["_id"])
+        self.skill = SKILL_INDEX.get((user.get("skill_level") or "").lower())
+        self.play_style = (user.get("play_style") or "").strip().lower()
+        self.games_mask = games_mask
+        self.availability_mask = availability_mask
+        # What match responses show; never includes email or password
+        self.profile = {
+            "id": self.id,
+            "username": user.get("username"),
+            "games": list(user.get("games") or []),
+            "skill_level": user.get("skill_level"),
+            "play_style": user.get("play_style"),
+            "availability": list(user.get("availability") or []),
+        }
+
+
+class MatchmakingIndex:
+    """In-memory player index for ranked matchmaking.
+
+    Players are filed under every combination of up to KEY_GAMES of their
+    games, then by skill level and play style, then by the sizes of their
+    game and availability sets, and last as a group of identical profiles,
+    scored once. Each level gives a tighter ceiling than the one above:
+    skill and play style fix their part of the score and the set sizes cap
+    the two overlaps.
+
+    A query starts from the (skill, play style) partitions under the
+    combinations of the seeker's games, always opens the node with the
+    highest ceiling next, and stops once the current top-K can't be beaten
+    by anything left, so it only reaches the buckets nearest the seeker.
+    Anyone sharing more games than a key holds is also filed under a
+    bigger key, so a key smaller than KEY_GAMES only has to rank players
+    sharing exactly its games; that caps their game overlap low enough to
+    skip most of them outright.
+
+    The index is updated incrementally as profiles change; changes travel
+    over the backplane so every worker stays current.
+    """
+
+    def __init__(self):
+        self.players: Dict[str, Player] = {}
+        # (games key as a mask, filed alone) -> (skill, play style)
+        # -> (game count, slot count) -> (games mask, availability mask) -> player ids
+        self.buckets: Dict[Tuple[int, bool], Dict[Tuple[Optional[int], str], Dict[Tuple[int, int], Dict[Tuple[int, int], Set[str]]]]] = {}
+        # (skill, play style, games mask, availability mask) -> player ids
+        self.groups: Dict[Tuple[Optional[int], str, int, int], Set[str]] = {}
+        self._bits: Dict[str, int] = {}
+        self.backplane = None
+
+    def attach(self, backplane):
+        self.backplane = backplane
+        backplane.subscribe(self._on_backplane_message)
+
+    async def load(self, db):
+        count = 0
+        projection = {"username": 1, "games": 1, "skill_level": 1, "play_style": 1, "availability": 1}
+        async for user in db.users.find({}, projection).batch_size(1000):
+            self.upsert(user)
+            count += 1
+        logger.info(f"Loaded {count} players into the matchmaking index")
+
+    async def publish(self, user: dict):
+        # Apply a profile change on every worker
+        if self.backplane is None:
+            self.upsert(user)
+            return
+        await self.backplane.publish(CHANNEL, json.dumps(self._player(user).profile))
+
+    async def _on_backplane_message(self, channel: str, data: str):
+        if channel == CHANNEL:
+            profile = json.loads(data)
+            profile["_id"] = profile.pop("id")
+            self.upsert(profile)
+
+    def _mask(self, namespace: str, values: FrozenSet[str]) -> int:
+        mask = 0
+        for value in values:
+            key = namespace + value
+            bit = self._bits.get(key)
+            if bit is None:
+                bit = self._bits[key] = 1 << len(self._bits)
+            mask |= bit
+        return mask
+
+    def _player(self, user: dict) -> Player:
+        return Player(
+            user,
+            self._mask("game:", _normalize(user.get("games"))),
+            self._mask("slot:", _normalize(user.get("availability")))
+        )
+
+    def upsert(self, user: dict):
+        player = self._player(user)
+        self.remove(player.id)
+        self.players[player.id] = player
+        group = self._group(player)
+        members = self.groups.get(group)
+        if members is None:
+            # A new profile group; every tree it is filed in shares the set
+            members = self.groups[group] = set()
+            for path in self._paths(player):
+                node = self.buckets
+                for key in path[:-1]:
+                    node = node.setdefault(key, {})
+                node[path[-1]] = members
+        members.add(player.id)
+
+    def remove(self, player_id: str):
+        player = self.players.pop(player_id, None)
+        if player is None:
+            return
+        group = self._group(player)
+        members = self.groups[group]
+        members.discard(player_id)
+        if members:
+            return
+        del self.groups[group]
+        for path in self._paths(player):
+            nodes = [self.buckets]
+            for key in path[:-1]:
+                nodes.append(nodes[-1][key])
+            # Drop the group, then any levels it leaves empty
+            for depth in range(len(path) - 1, -1, -1):
+                del nodes[depth][path[depth]]
+                if nodes[depth]:
+                    break
+
+    @staticmethod
+    def _group(player: Player):
+        return (player.skill, player.play_style, player.games_mask, player.availability_mask)
+
+    def _paths(self, player: Player):
+        partition = (player.skill, player.play_style)
+        shape = (_popcount(player.games_mask), _popcount(player.availability_mask))
+        if shape[0] > MAX_KEYED_GAMES:
+            keys = [(single, True) for single in _bits_of(player.games_mask)]
+        else:
+            keys = [(subset, False) for subset in _subsets(player.games_mask, KEY_GAMES)]
+        return [(key, partition, shape, (player.games_mask, player.availability_mask)) for key in keys]
+
+    @staticmethod
+    def _max_overlap(a: int, b: int) -> float:
+        # Jaccard of sets sized a and b can't exceed min/max
+        if not a or not b:
+            return 0.0
+        return min(a, b) / max(a, b)
+
+    @staticmethod
+    def _skill_closeness(a: Optional[int], b: Optional[int]) -> float:
+        if a is None or b is None:
+            return 0.0
+        return 1 - abs(a - b) / MAX_SKILL_DISTANCE
+
+    def _roots(self, seeker: Player, game: Optional[str]) -> Optional[List[Tuple[Tuple[int, bool], Optional[int]]]]:
+        # The trees a query starts from, each with how many games a player
+        # filed there can share with the seeker (None if any number). A
+        # player sharing more than a key's own games is also filed under a
+        # bigger key, up to KEY_GAMES.
+        if game:
+            wanted = self._bits.get("game:" + game.strip().lower())
+            if wanted is None:
+                return None
+            roots = [((wanted, True), None)]
+            if _popcount(seeker.games_mask) > MAX_KEYED_GAMES:
+                return roots + [((wanted, False), None)]
+            inside = _popcount(wanted & seeker.games_mask)
+            for others in [0] + _subsets(seeker.games_mask & ~wanted, KEY_GAMES - 1):
+                extra = _popcount(others)
+                roots.append(((wanted | others, False), None if extra == KEY_GAMES - 1 else inside + extra))
+            return roots
+
+        singles = _bits_of(seeker.games_mask)
+        roots = [((single, True), None) for single in singles]
+        if len(singles) > MAX_KEYED_GAMES:
+            return roots + [((single, False), None) for single in singles]
+        for key in _subsets(seeker.games_mask, KEY_GAMES):
+            size = _popcount(key)
+            roots.append(((key, False), None if size == KEY_GAMES else size))
+        return roots
+
+    def find_matches(self, user: dict, game: Optional[str] = None, limit: int = 10) -> List[dict]:
+        seeker = self._player(user)
+        seeker_games = _popcount(seeker.games_mask)
+        seeker_slots = _popcount(seeker.availability_mask)
+
+        roots = self._roots(seeker, game)
+        if roots is None:
+            return []
+
+        # Max-heap of (-ceiling, order, depth, node, known): `known` is the
+        # part of the score the node already fixes, and `order` keeps nodes
+        # from being compared
+        frontier = []
+        order = 0
+        for key, max_shared in roots:
+            if max_shared is not None:
+                game_ceiling = max_shared / max(seeker_games, 1)
+            elif key[1]:
+                # Everyone filed alone has more than MAX_KEYED_GAMES games
+                game_ceiling = self._max_overlap(seeker_games, max(seeker_games, MAX_KEYED_GAMES + 1))
+            else:
+                game_ceiling = 1.0
+            for (skill, play_style), partition in self.buckets.get(key, {}).items():
+                fixed = SKILL_WEIGHT * self._skill_closeness(seeker.skill, skill)
+                if seeker.play_style and play_style == seeker.play_style:
+                    fixed += PLAY_STYLE_WEIGHT
+                ceiling = fixed + GAME_WEIGHT * game_ceiling + AVAILABILITY_WEIGHT
+                order += 1
+                frontier.append((-ceiling, order, 0, partition, (fixed, max_shared)))
+        heapq.heapify(frontier)
+
+        overlap_caps: Dict[Tuple[Optional[int], int, int], float] = {}
+        top: List[Tuple[float, str]] = []
+        seen = {seeker.id}
+        while frontier:
+            ceiling, _, depth, node, known = heapq.heappop(frontier)
+            if len(top) >= limit and top[0][0] >= -ceiling:
+                break
+
+            if depth == 0:
+                # Partition -> (game count, slot count) shapes; the same
+                # shapes recur across partitions, so their overlap caps are
+                # worked out once per query
+                fixed, max_shared = known
+                for (game_count, slot_count), shape in node.items():
+                    overlaps = overlap_caps.get((max_shared, game_count, slot_count))
+                    if overlaps is None:
+                        if max_shared is None:
+                            game_bound = self._max_overlap(seeker_games, game_count)
+                        else:
+                            game_bound = max_shared / (seeker_games + game_count - max_shared)
+                        overlaps = GAME_WEIGHT * game_bound + AVAILABILITY_WEIGHT * self._max_overlap(seeker_slots, slot_count)
+                        overlap_caps[(max_shared, game_count, slot_count)] = overlaps
+                    bound = fixed + overlaps
+                    if len(top) < limit or bound > top[0][0]:
+                        order += 1
+                        heapq.heappush(frontier, (-bound, order, 1, shape, (fixed, max_shared, game_count)))
+            else:
+                # Shape -> groups, scored exactly; the shape fixes the union
+                # of the games up to the shared ones
+                fixed, max_shared, game_count = known
+                for (games_mask, availability_mask), members in node.items():
+                    shared = _popcount(seeker.games_mask & games_mask)
+                    if max_shared is not None and shared > max_shared:
+                        continue
+                    score = fixed + GAME_WEIGHT * shared / (seeker_games + game_count - shared)
+                    score += AVAILABILITY_WEIGHT * _overlap(seeker.availability_mask, availability_mask)
+                    if len(top) >= limit and score <= top[0][0]:
+                        continue
+                    for player_id in members:
+                        if player_id in seen:
+                            continue
+                        seen.add(player_id)
+                        if len(top) < limit:
+                            heapq.heappush(top, (score, player_id))
+                        elif score > top[0][0]:
+                            heapq.heapreplace(top, (score, player_id))
+
+        return [
+            {**self.players[player_id].profile, "score": round(score, 4)}
+            for score, player_id in sorted(top, reverse=True)
+        ]
+
+    def play_style(self, player_id: str) -> Optional[str]:
+        player = self.players.get(player_id)
+        return player.play_style if player else None
+
+    def stats(self) -> dict:
+        shapes = sum(len(partition) for partitions in self.buckets.values() for partition in partitions.values())
+        return {"players": len(self.players), "groups": len(self.groups), "buckets": shapes}
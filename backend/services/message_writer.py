@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from typing import List, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop() behind every pending write; the loop exits on reaching it
+_STOP = object()
+
+
+class MessageWriter:
+    """Write-behind stage that coalesces message inserts into insert_many.
+
+    ``write`` assigns the document's ``_id`` up front, queues it, and resolves
+    once the batch containing it has been acknowledged by MongoDB, so callers
+    can build responses from the in-memory document and only broadcast
+    messages that are durable. Whatever is queued while a batch is in flight
+    goes out in the next one; ``linger`` optionally waits a little longer to
+    fill a batch under light load.
+    """
+
+    def __init__(self, max_batch: int = 100, linger: float = 0.002):
+        self.max_batch = max_batch
+        self.linger = linger
+        self.batches = 0
+        self.written = 0
+        self._collection = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        self._stopping = False
+
+    def start(self, collection):
+        self._collection = collection
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Let the loop write everything queued so far and exit, rather than
+        # cancelling it mid insert_many and stranding that batch's callers
+        self._stopping = True
+        if self._task is not None:
+            self._queue.put_nowait(_STOP)
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Message writer loop failed: {str(e)}")
+            self._task = None
+        # Whatever is left (e.g. if the loop never started) is written, or
+        # its callers get the error
+        leftover = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                leftover.append(item)
+        for start in range(0, len(leftover), self.max_batch):
+            await self._flush(leftover[start:start + self.max_batch])
+
+    async def write(self, doc: dict) -> dict:
+        if self._stopping:
+            raise RuntimeError("Message writer is stopped")
+        doc.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((doc, future))
+        await future
+        return doc
+
+    def _drain(self, batch: List[Tuple[dict, asyncio.Future]]):
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _STOP:
+                # Stays queued for _run to see once this batch is written
+                self._queue.put_nowait(item)
+                break
+            batch.append(item)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = self._drain([item])
+            deadline = loop.time() + self.linger
+            while len(batch) < self.max_batch and not self._stopping:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    self._queue.put_nowait(item)
+                    break
+                batch.append(item)
+                self._drain(batch)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        failed = {}
+        try:
+            await self._collection.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed[error["index"]] = error.get("errmsg", "write failed")
+        except Exception as e:
+            logger.error(f"Failed to write message batch of {len(batch)}: {str(e)}")
+            failed = {index: str(e) for index in range(len(batch))}
+
+        self.batches += 1
+        self.written += len(batch) - len(failed)
+        for index, (doc, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(RuntimeError(f"Message {doc['_id']} was not stored: {failed[index]}"))
+            else:
+                future.set_result(doc["_id"])
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "written": self.written,
+            "queued": self._queue.qsize(),
+            "avg_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+        }
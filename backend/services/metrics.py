@@ -0,0 +1,161 @@
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from pymongo import monitoring
+from starlette.routing import Match
+
+# Everything /api/metrics exposes; figures are per worker process
+registry = CollectorRegistry()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency",
+    ["method", "route", "status"], registry=registry
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being handled",
+    ["method", "route"], registry=registry
+)
+# A route whose command count grows with the data it returns is an N+1
+REQUEST_MONGO_COMMANDS = Histogram(
+    "http_request_mongo_commands", "MongoDB commands issued per HTTP request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89), registry=registry
+)
+REQUEST_MONGO_SECONDS = Histogram(
+    "http_request_mongo_seconds", "Time spent in MongoDB commands per HTTP request",
+    ["route"], registry=registry
+)
+MONGO_COMMAND_DURATION = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency",
+    ["command", "route"], registry=registry
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongo_command_failures", "Failed MongoDB commands",
+    ["command", "route"], registry=registry
+)
+
+# Route label for commands issued outside a request (background writers, jobs)
+BACKGROUND = "background"
+
+
+class _RequestStats:
+    __slots__ = ("route", "commands", "mongo_seconds")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.commands = 0
+        self.mongo_seconds = 0.0
+
+
+# Motor copies the context into its worker threads, so command events see
+# the request that issued them
+_current_request: ContextVar[Optional[_RequestStats]] = ContextVar("current_request", default=None)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per-command latency from PyMongo command monitoring, labelled with
+    the route of the request that issued the command."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed: bool):
+        seconds = event.duration_micros / 1e6
+        request = _current_request.get()
+        route = request.route if request is not None else BACKGROUND
+        MONGO_COMMAND_DURATION.labels(event.command_name, route).observe(seconds)
+        if failed:
+            MONGO_COMMAND_FAILURES.labels(event.command_name, route).inc()
+        if request is not None:
+            request.commands += 1
+            request.mongo_seconds += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing HTTP requests per route template.
+
+    Requests are labelled with the matching route's path (``/api/teams/{team_id}``
+    rather than the raw URL) so label cardinality stays bounded.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def _route(self, scope) -> str:
+        partial = None
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial is None:
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        request = _RequestStats(self._route(scope))
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, request.route)
+        in_progress.inc()
+        token = _current_request.set(request)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, request.route, str(status_code)).observe(time.perf_counter() - started)
+            REQUEST_MONGO_COMMANDS.labels(request.route).observe(request.commands)
+            REQUEST_MONGO_SECONDS.labels(request.route).observe(request.mongo_seconds)
+
+
+class StatsCollector:
+    """Exposes the services' ``stats()`` dicts as gauges.
+
+    ``sources`` maps a metric prefix to a callable returning a flat dict
+    of numbers, or a dict of such dicts keyed by server address (the
+    connection pool stats). Values are read on every scrape.
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], dict]]):
+        self.sources = sources
+
+    def collect(self):
+        for prefix, stats in self.sources.items():
+            families = {}
+            for key, value in stats().items():
+                if isinstance(value, dict):
+                    for name, number in value.items():
+                        self._add(families, f"{prefix}_{name}", number, ["address"], [key])
+                else:
+                    self._add(families, f"{prefix}_{key}", value, [], [])
+            yield from families.values()
+
+    @staticmethod
+    def _add(families, name, value, labels, label_values):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return
+        family = families.get(name)
+        if family is None:
+            family = families[name] = GaugeMetricFamily(name, name.replace("_", " "), labels=labels)
+        family.add_metric(label_values, value)
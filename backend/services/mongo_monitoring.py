@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Dict
+
+from pymongo import monitoring
+
+
+class _PoolStats:
+    __slots__ = ("connections", "checked_out", "waiting", "checkouts", "checkout_failures", "wait_seconds_total", "wait_seconds_max")
+
+    def __init__(self):
+        self.connections = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool gauges per server, fed by PyMongo pool events.
+
+    Tracks open and checked-out connections, operations waiting for a
+    connection, and how long checkouts wait. Checkouts run on Motor's
+    worker threads, so a checkout's start time is kept per thread and
+    counters are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._pools: Dict[str, _PoolStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _pool(self, address) -> _PoolStats:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _PoolStats()
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address).connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event.address).connections -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self._pool(event.address).waiting += 1
+
+    def _checkout_done(self, address) -> _PoolStats:
+        waited = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        pool = self._pool(address)
+        pool.waiting -= 1
+        pool.wait_seconds_total += waited
+        pool.wait_seconds_max = max(pool.wait_seconds_max, waited)
+        return pool
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._checkout_done(event.address).checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._checkout_done(event.address)
+            pool.checked_out += 1
+            pool.checkouts += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).checked_out -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                address: {
+                    "connections": pool.connections,
+                    "checked_out": pool.checked_out,
+                    "wait_queue": pool.waiting,
+                    "checkouts": pool.checkouts,
+                    "checkout_failures": pool.checkout_failures,
+                    "wait_ms_avg": round(pool.wait_seconds_total / max(pool.checkouts + pool.checkout_failures, 1) * 1000, 3),
+                    "wait_ms_max": round(pool.wait_seconds_max * 1000, 3),
+                }
+                for address, pool in self._pools.items()
+            }
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Dict, Set
+
+logger = logging.getLogger(__name__)
+
+# Backplane channel prefix for per-user notification topics
+CHANNEL_PREFIX = "notify:"
+
+
+class NotificationBus:
+    """Delivers new notifications to the push streams of their recipients.
+
+    Each open stream registers a bounded queue under the recipient's id.
+    Notifications are published through the backplane so a stream served
+    by any worker sees inserts made by every other worker. A stream whose
+    queue is full misses the event; clients recover it with ``since``.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.dropped = 0
+        self.backplane = None
+
+    def attach(self, backplane):
+        self.backplane = backplane
+        backplane.subscribe(self._on_backplane_message)
+
+    def subscribe(self, recipient_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(recipient_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, recipient_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(recipient_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[recipient_id]
+
+    async def publish(self, recipient_id: str, data: str):
+        if self.backplane is None:
+            self._deliver(recipient_id, data)
+            return
+        await self.backplane.publish(CHANNEL_PREFIX + recipient_id, data)
+
+    async def _on_backplane_message(self, channel: str, data: str):
+        if channel.startswith(CHANNEL_PREFIX):
+            self._deliver(channel[len(CHANNEL_PREFIX):], data)
+
+    def _deliver(self, recipient_id: str, data: str):
+        for queue in list(self.subscribers.get(recipient_id, ())):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "recipients": len(self.subscribers),
+            "streams": sum(len(queues) for queues in self.subscribers.values()),
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,34 @@
+import time
+from typing import Optional
+
+from services.ttl_cache import TTLCache
+
+
+class PrincipalCache:
+    """Per-process LRU of authenticated user documents keyed by token subject.
+
+    Entries expire after ``ttl_seconds`` so changes made by other workers are
+    picked up eventually; changes made through this process should call
+    ``invalidate`` so they are visible immediately.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self._cache = TTLCache(max_size, clock=time.monotonic)
+
+    def get(self, subject: str) -> Optional[dict]:
+        user = self._cache.get(subject)
+        # Hand out a copy so handlers can't mutate the cached document
+        return dict(user) if user is not None else None
+
+    def set(self, subject: str, user: dict):
+        self._cache.set(subject, dict(user), time.monotonic() + self.ttl_seconds)
+
+    def invalidate(self, subject: str):
+        self._cache.pop(subject)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "ttl_seconds": self.ttl_seconds}
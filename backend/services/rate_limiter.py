@@ -0,0 +1,33 @@
+import time
+from collections import deque
+from typing import Deque, Dict
+
+
+class RecipientRateLimiter:
+    """Sliding-window limit of events per key (per process)."""
+
+    def __init__(self, max_events: int, window_seconds: float):
+        self.max_events = max_events
+        self.window_seconds = window_seconds
+        self._events: Dict[str, Deque[float]] = {}
+        self._last_sweep = time.monotonic()
+
+    def allow(self, key: str) -> bool:
+        now = time.monotonic()
+        cutoff = now - self.window_seconds
+        if now - self._last_sweep > self.window_seconds:
+            self._sweep(cutoff)
+            self._last_sweep = now
+
+        events = self._events.setdefault(key, deque())
+        while events and events[0] <= cutoff:
+            events.popleft()
+        if len(events) >= self.max_events:
+            return False
+        events.append(now)
+        return True
+
+    def _sweep(self, cutoff: float):
+        # Drop keys with no events inside the window to keep memory bounded
+        for key in [k for k, events in self._events.items() if not events or events[-1] <= cutoff]:
+            del self._events[key]
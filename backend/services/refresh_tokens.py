@@ -0,0 +1,143 @@
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Backplane channel carrying revoke-all events
+CHANNEL = "auth"
+
+
+class RevocationList:
+    """In-process denylist of users whose tokens were all revoked.
+
+    Maps a user id to the time of their last revoke-all; an access token
+    issued at or before that time is rejected. Checking a token is a dict
+    lookup, so the request path never goes to the database for it.
+    Entries are only needed for as long as an access token can live, and
+    revocations reach every worker over the backplane.
+    """
+
+    def __init__(self, retention_seconds: float):
+        self.retention_seconds = retention_seconds
+        self.revoked_before: Dict[str, float] = {}
+        self.backplane = None
+
+    def attach(self, backplane):
+        self.backplane = backplane
+        backplane.subscribe(self._on_backplane_message)
+
+    async def load(self, db):
+        async for doc in db.token_revocations.find({"expires_at": {"$gt": datetime.utcnow()}}):
+            self.add(doc["_id"], doc["revoked_at"])
+        logger.info(f"Loaded {len(self.revoked_before)} token revocations")
+
+    def add(self, user_id: str, revoked_at: float):
+        self._expire()
+        self.revoked_before[user_id] = max(revoked_at, self.revoked_before.get(user_id, 0))
+
+    def is_revoked(self, claims: dict) -> bool:
+        revoked_at = self.revoked_before.get(claims.get("uid"))
+        return revoked_at is not None and claims.get("iat", 0) <= revoked_at
+
+    async def publish(self, user_id: str, revoked_at: float):
+        # Applied here first, so this worker never depends on its own
+        # backplane delivery; add() is idempotent when that arrives
+        self.add(user_id, revoked_at)
+        if self.backplane is not None:
+            await self.backplane.publish(CHANNEL, json.dumps({"uid": user_id, "revoked_at": revoked_at}))
+
+    async def _on_backplane_message(self, channel: str, data: str):
+        if channel == CHANNEL:
+            event = json.loads(data)
+            self.add(event["uid"], event["revoked_at"])
+
+    def _expire(self):
+        # Tokens older than the retention window have expired on their own
+        cutoff = time.time() - self.retention_seconds
+        for user_id in [uid for uid, at in self.revoked_before.items() if at < cutoff]:
+            del self.revoked_before[user_id]
+
+
+class RefreshTokenStore:
+    """Server-side state for rotating refresh tokens.
+
+    Each login starts a token family, stored as one document holding the
+    family's rotation counter; refresh tokens carry the family id and the
+    counter they were issued at. Rotating is a single conditional update
+    that only matches the current counter, so a token that was already
+    rotated can't be used again. Presenting one is treated as theft and
+    revokes the whole family. Family documents expire through a TTL index.
+
+    The one exception is a token exactly one rotation behind, presented
+    within ``reuse_grace`` of that rotation: that is a client racing itself
+    (several requests refreshing at once), so it gets the current successor
+    instead of a revoked session.
+    """
+
+    def __init__(self, revocations: RevocationList, lifetime: timedelta, reuse_grace: timedelta = timedelta(seconds=10)):
+        self.revocations = revocations
+        self.lifetime = lifetime
+        self.reuse_grace = reuse_grace
+
+    async def issue(self, db, user_id: str) -> dict:
+        # Claims to embed in the first refresh token of a new family
+        family = uuid.uuid4().hex
+        await db.refresh_tokens.insert_one({
+            "_id": family,
+            "user_id": user_id,
+            "counter": 0,
+            "revoked": False,
+            "expires_at": datetime.utcnow() + self.lifetime
+        })
+        return {"fam": family, "ctr": 0}
+
+    async def rotate(self, db, claims: dict) -> Optional[dict]:
+        # Claims for the next refresh token, or None if this one is spent,
+        # revoked or unknown
+        family, counter = claims.get("fam"), claims.get("ctr")
+        if family is None or counter is None:
+            return None
+
+        now = datetime.utcnow()
+        rotated = await db.refresh_tokens.find_one_and_update(
+            {"_id": family, "counter": counter, "revoked": False},
+            {"$inc": {"counter": 1}, "$set": {"expires_at": now + self.lifetime, "rotated_at": now}},
+            projection={"counter": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if rotated is not None:
+            return {"fam": family, "ctr": rotated["counter"]}
+
+        # Only the failure path reads, to tell reuse from a dead family
+        current = await db.refresh_tokens.find_one({"_id": family}, {"counter": 1, "revoked": 1, "user_id": 1, "rotated_at": 1})
+        if current is None or current["revoked"] or current["counter"] <= counter:
+            return None
+        rotated_at = current.get("rotated_at")
+        if current["counter"] == counter + 1 and rotated_at is not None and now - rotated_at <= self.reuse_grace:
+            return {"fam": family, "ctr": current["counter"]}
+        logger.warning(f"Refresh token reuse detected for user {current['user_id']}; revoking family {family}")
+        await self.revoke_family(db, family)
+        return None
+
+    async def revoke_family(self, db, family: str):
+        await db.refresh_tokens.update_one({"_id": family}, {"$set": {"revoked": True}})
+
+    async def revoke_all(self, db, user_id: str):
+        # Every refresh token family, plus access tokens issued until now
+        revoked_at = time.time()
+        await db.refresh_tokens.update_many({"user_id": user_id, "revoked": False}, {"$set": {"revoked": True}})
+        await db.token_revocations.update_one(
+            {"_id": user_id},
+            {"$set": {
+                "revoked_at": revoked_at,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.revocations.retention_seconds)
+            }},
+            upsert=True
+        )
+        await self.revocations.publish(user_id, revoked_at)
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+logger = logging.getLogger(__name__)
+
+# Build output with a content hash in the name (main.3f2a1b9c.js) never
+# changes under the same URL, so browsers may keep it for good
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else (index.html, manifest.json, ...) is revalidated by ETag
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Precompressed variants written by compress_static.py, best first
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+# Files up to this size are held in memory; larger ones are streamed
+# from disk
+MAX_IN_MEMORY_BYTES = 512 * 1024
+
+
+class _Variant:
+    __slots__ = ("path", "stat", "etag", "body")
+
+    def __init__(self, path: Path, etag: str):
+        self.path = path
+        self.stat = os.stat(path)
+        self.etag = etag
+        self.body = path.read_bytes() if self.stat.st_size <= MAX_IN_MEMORY_BYTES else None
+
+
+class _Asset:
+    __slots__ = ("media_type", "cache_control", "variants")
+
+    def __init__(self, media_type: str, cache_control: str, variants: Dict[str, _Variant]):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        # content-coding -> variant; "identity" is the original file
+        self.variants = variants
+
+
+class StaticAssets:
+    """In-memory manifest of the built frontend.
+
+    The static directory is walked once at startup; after that a request
+    costs a dict lookup, with no stat calls and, for small files, no disk
+    reads. Precompressed .br/.gz siblings are served to clients that accept
+    them, hashed build assets are marked immutable, and everything gets an
+    ETag so revalidation is answered with a 304.
+    """
+
+    def __init__(self):
+        self.assets: Dict[str, _Asset] = {}
+
+    def load(self, directory: Path):
+        assets = {}
+        for path in sorted(directory.rglob("*")):
+            if not path.is_file() or path.suffix in (".br", ".gz"):
+                continue
+            digest = hashlib.sha1(path.read_bytes()).hexdigest()[:16]
+            variants = {"identity": _Variant(path, f'"{digest}"')}
+            for encoding, suffix in ENCODINGS:
+                compressed = path.with_name(path.name + suffix)
+                if compressed.is_file():
+                    variants[encoding] = _Variant(compressed, f'"{digest}-{encoding}"')
+
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            # Starlette adds the charset to text/* types itself
+            if media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            cache_control = IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path.name) else REVALIDATE_CACHE_CONTROL
+            assets[path.relative_to(directory).as_posix()] = _Asset(media_type, cache_control, variants)
+
+        self.assets = assets
+        compressed = sum(len(asset.variants) > 1 for asset in assets.values())
+        logger.info(f"Loaded {len(assets)} static assets ({compressed} precompressed) from {directory}")
+
+    def get(self, path: str) -> Optional[_Asset]:
+        return self.assets.get(path.strip("/"))
+
+    @staticmethod
+    def _accepted(request: Request) -> set:
+        accepted = set()
+        for part in request.headers.get("accept-encoding", "").split(","):
+            coding, _, params = part.partition(";")
+            name, _, value = params.partition("=")
+            try:
+                if name.strip() == "q" and float(value) == 0:
+                    continue
+            except ValueError:
+                continue
+            accepted.add(coding.strip().lower())
+        return accepted
+
+    def response(self, asset: _Asset, request: Request) -> Response:
+        accepted = self._accepted(request)
+        encoding = next((encoding for encoding, _ in ENCODINGS if encoding in asset.variants and encoding in accepted), "identity")
+        variant = asset.variants[encoding]
+
+        headers = {"ETag": variant.etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if_none_match = request.headers.get("if-none-match")
+        # Weak comparison: proxies may hand back W/"..." for our strong tags
+        if if_none_match and (if_none_match.strip() == "*" or variant.etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        if variant.body is not None:
+            return Response(variant.body, media_type=asset.media_type, headers=headers)
+        # stat_result is passed so FileResponse doesn't stat the file again
+        return FileResponse(variant.path, media_type=asset.media_type, headers=headers, stat_result=variant.stat)
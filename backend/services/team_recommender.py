@@ -0,0 +1,219 @@
+import json
+import logging
+import time
+from datetime import timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.matchmaking import MAX_SKILL_DISTANCE, SKILL_INDEX
+
+logger = logging.getLogger(__name__)
+
+# Score weights; a perfect match scores their sum
+GAME_WEIGHT = 0.35
+SKILL_WEIGHT = 0.25
+PLAY_STYLE_WEIGHT = 0.15
+OPEN_SLOTS_WEIGHT = 0.1
+RECENCY_WEIGHT = 0.15
+
+# A team's recency score halves every this many days
+RECENCY_HALF_LIFE_DAYS = 7
+
+# Backplane channel carrying team changes
+CHANNEL = "teams"
+
+INITIAL_CAPACITY = 1024
+UNKNOWN = -1
+
+
+def _key(value) -> str:
+    return (value or "").strip().lower()
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value is None:
+        return time.time()
+    # Naive datetimes are UTC throughout the app
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def team_record(team: dict, play_style: Optional[str] = None) -> dict:
+    """The slice of a team document the recommender scores on."""
+    return {
+        "id": str(team.get("_id") or team.get("id")),
+        "game": team.get("game"),
+        "skill_level": team.get("skill_level"),
+        "play_style": play_style,
+        "open_slots": team.get("open_slots", 0),
+        "max_members": team.get("max_members", 0),
+        "created_at": _timestamp(team.get("created_at")),
+    }
+
+
+class TeamRecommender:
+    """Array-backed snapshot of teams for scoring "teams for me".
+
+    Each team is a row in a set of parallel NumPy columns (game, skill,
+    leader play style, open slots, size, creation time), with strings
+    interned to integer codes. Ranking is a few vectorized ops over the
+    columns and an argpartition for the top K, so its cost grows with the
+    number of teams but never runs Python per team. Rows are updated in
+    place as teams change and freed rows are reused; changes travel over
+    the backplane so every worker stays current.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.rows: Dict[str, int] = {}
+        self.ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._codes: Dict[str, int] = {}
+        self._allocate(capacity)
+        self.backplane = None
+
+    def _allocate(self, capacity: int):
+        def grow(column, dtype, fill):
+            new = np.full(capacity, fill, dtype=dtype)
+            if column is not None:
+                new[:len(column)] = column
+            return new
+
+        self.active = grow(getattr(self, "active", None), np.bool_, False)
+        self.game = grow(getattr(self, "game", None), np.int32, UNKNOWN)
+        self.skill = grow(getattr(self, "skill", None), np.int8, UNKNOWN)
+        self.play_style = grow(getattr(self, "play_style", None), np.int32, UNKNOWN)
+        self.open_slots = grow(getattr(self, "open_slots", None), np.int32, 0)
+        self.max_members = grow(getattr(self, "max_members", None), np.int32, 0)
+        self.created_at = grow(getattr(self, "created_at", None), np.float64, 0.0)
+
+    def attach(self, backplane):
+        self.backplane = backplane
+        backplane.subscribe(self._on_backplane_message)
+
+    async def load(self, db, play_style_of: Callable[[str], Optional[str]] = lambda leader_id: None):
+        count = 0
+        projection = {"game": 1, "skill_level": 1, "leader_id": 1, "open_slots": 1, "max_members": 1, "created_at": 1}
+        async for team in db.teams.find({}, projection).batch_size(1000):
+            self.upsert(team_record(team, play_style_of(team.get("leader_id"))))
+            count += 1
+        logger.info(f"Loaded {count} teams into the recommendation snapshot")
+
+    async def publish(self, op: str, **payload):
+        # Apply a team change on every worker
+        if self.backplane is None:
+            self._apply(op, payload)
+            return
+        await self.backplane.publish(CHANNEL, json.dumps({"op": op, **payload}))
+
+    async def _on_backplane_message(self, channel: str, data: str):
+        if channel == CHANNEL:
+            payload = json.loads(data)
+            self._apply(payload.pop("op"), payload)
+
+    def _apply(self, op: str, payload: dict):
+        if op == "upsert":
+            self.upsert(payload["team"])
+        elif op == "slots":
+            self.set_open_slots(payload["id"], payload["open_slots"])
+        elif op == "remove":
+            self.remove(payload["id"])
+
+    def _code(self, value, create: bool = True) -> int:
+        key = _key(value)
+        if not key:
+            return UNKNOWN
+        code = self._codes.get(key)
+        if code is None:
+            if not create:
+                return UNKNOWN
+            code = self._codes[key] = len(self._codes)
+        return code
+
+    def upsert(self, record: dict):
+        row = self.rows.get(record["id"])
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self.ids)
+                if row == len(self.active):
+                    self._allocate(len(self.active) * 2)
+                self.ids.append(None)
+            self.rows[record["id"]] = row
+            self.ids[row] = record["id"]
+            self.play_style[row] = UNKNOWN
+        self.active[row] = True
+        self.game[row] = self._code(record.get("game"))
+        self.skill[row] = SKILL_INDEX.get(_key(record.get("skill_level")), UNKNOWN)
+        # Updates don't carry the leader's play style; keep the one we have
+        if record.get("play_style") is not None:
+            self.play_style[row] = self._code(record["play_style"])
+        self.open_slots[row] = record.get("open_slots", 0)
+        self.max_members[row] = record.get("max_members", 0)
+        self.created_at[row] = record["created_at"]
+
+    def set_open_slots(self, team_id: str, open_slots: int):
+        row = self.rows.get(team_id)
+        if row is not None:
+            self.open_slots[row] = open_slots
+
+    def remove(self, team_id: str):
+        row = self.rows.pop(team_id, None)
+        if row is None:
+            return
+        self.active[row] = False
+        self.ids[row] = None
+        self._free.append(row)
+
+    def recommend(self, user: dict, limit: int = 10) -> List[Tuple[str, float]]:
+        """Best-scoring open teams for `user` as (team_id, score), best first."""
+        n = len(self.ids)
+        if not n:
+            return []
+        candidates = self.active[:n] & (self.open_slots[:n] > 0)
+
+        # Only teams for games the player plays, unless they list none
+        game_codes = [self._code(game, create=False) for game in user.get("games") or []]
+        game_codes = [code for code in game_codes if code != UNKNOWN]
+        if user.get("games"):
+            game_match = np.zeros(n, dtype=np.bool_)
+            for code in game_codes:
+                game_match |= self.game[:n] == code
+            candidates &= game_match
+
+        rows = np.flatnonzero(candidates)
+        if not len(rows):
+            return []
+
+        scores = np.full(len(rows), GAME_WEIGHT if game_codes else 0.0, dtype=np.float32)
+
+        skill = SKILL_INDEX.get(_key(user.get("skill_level")))
+        if skill is not None:
+            team_skill = self.skill[rows].astype(np.float32)
+            closeness = 1 - np.abs(team_skill - skill) / MAX_SKILL_DISTANCE
+            scores += SKILL_WEIGHT * np.where(team_skill >= 0, closeness, 0)
+
+        play_style = self._code(user.get("play_style"), create=False)
+        if play_style != UNKNOWN:
+            scores += PLAY_STYLE_WEIGHT * (self.play_style[rows] == play_style)
+
+        # Emptier teams have more room to fit in
+        max_members = np.maximum(self.max_members[rows], 1)
+        scores += OPEN_SLOTS_WEIGHT * np.minimum(self.open_slots[rows] / max_members, 1)
+
+        age_days = np.maximum(time.time() - self.created_at[rows], 0) / 86400
+        scores += RECENCY_WEIGHT * np.exp2(-age_days / RECENCY_HALF_LIFE_DAYS)
+
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.ids[rows[i]], round(float(scores[i]), 4)) for i in top]
+
+    def stats(self) -> dict:
+        return {"teams": len(self.rows), "capacity": len(self.active)}
@@ -0,0 +1,8 @@
+from datetime import datetime
+
+
+def utc_now_ms() -> datetime:
+    # BSON dates only keep milliseconds; documents timestamped with this
+    # can be returned as built, since they match what gets stored
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
@@ -0,0 +1,37 @@
+import hashlib
+import time
+from typing import Optional
+
+from services.ttl_cache import TTLCache
+
+
+class VerifiedTokenCache:
+    """Per-process LRU of already-verified JWTs and their claims.
+
+    Keys are the SHA-256 of the raw token, so the cache never holds bearer
+    credentials, and an entry lives until the token's own ``exp``: a cached
+    token is exactly as valid as it was when its signature was checked.
+    """
+
+    def __init__(self, max_size: int = 4096):
+        # exp is a Unix timestamp, so entries expire on wall-clock time
+        self._cache = TTLCache(max_size, clock=time.time)
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        return self._cache.get(self._key(token))
+
+    def set(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if expires_at is None:
+            return
+        self._cache.set(self._key(token), claims, expires_at)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
@@ -9,4 +9,8 @@ Write-Host "Installing backend dependencies..."
 Set-Location ../backend
 pip install -r requirements.txt
 
+# Precompress static assets (.gz/.br served by the backend)
+Write-Host "Precompressing static files..."
+python compress_static.py static
+
 Write-Host "Build complete!"
@@ -39,4 +39,8 @@ ls -la static/
 echo "Installing backend dependencies..."
 pip install -r requirements.txt
 
+# Precompress static assets (.gz/.br served by the backend)
+echo "Precompressing static files..."
+python compress_static.py static
+
 echo "Build complete!"
@@ -35,7 +35,9 @@ const ChatWindow = ({ chatId, otherUser }) => {
     const wsHost = process.env.NODE_ENV === 'production' 
       ? 'esports-team-finder-backend.onrender.com' 
       : 'localhost:8000';
-    const wsConnection = new WebSocket(`${wsProtocol}//${wsHost}/api/ws/chat/${chatId}`);
+    const wsConnection = new WebSocket(
+      `${wsProtocol}//${wsHost}/api/chat/ws/chat/${chatId}?token=${encodeURIComponent(token)}`
+    );
     
     wsConnection.onopen = () => {
       console.log('WebSocket Connected');
@@ -44,6 +46,10 @@ const ChatWindow = ({ chatId, otherUser }) => {
     wsConnection.onmessage = (event) => {
       try {
         const message = JSON.parse(event.data);
+        if (message.type === 'error') {
+          console.error('Chat error:', message.detail);
+          return;
+        }
         setMessages(prev => [...prev, message]);
         scrollToBottom();
       } catch (error) {
@@ -66,7 +72,7 @@ const ChatWindow = ({ chatId, otherUser }) => {
         wsConnection.close();
       }
     };
-  }, [chatId]);
+  }, [chatId, token]);
 
   useEffect(() => {
     fetchMessages();
@@ -97,32 +103,12 @@ const ChatWindow = ({ chatId, otherUser }) => {
 
   const sendMessage = async (e) => {
     e.preventDefault();
-    if (!newMessage.trim() || !ws) return;
+    if (!newMessage.trim() || !ws || ws.readyState !== WebSocket.OPEN) return;
 
     try {
-      // Send through HTTP for persistence
-      const baseUrl = process.env.NODE_ENV === 'production' ? '' : 'http://localhost:8000';
-      const response = await fetch(`${baseUrl}/api/chats/${chatId}/messages`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          content: newMessage,
-          chat_id: chatId,
-        }),
-      });
-
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
-      const message = await response.json();
-      
-      // Send through WebSocket for real-time
-      ws.send(JSON.stringify(message));
-      
+      // The server stores the message and broadcasts it back to the whole
+      // room, including us, so it shows up through onmessage
+      ws.send(JSON.stringify({ content: newMessage }));
       setNewMessage('');
     } catch (error) {
       console.error('Error sending message:', error);
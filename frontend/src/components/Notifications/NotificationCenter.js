@@ -1,7 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   Box,
   Badge,
+  Button,
   IconButton,
   Popover,
   List,
@@ -17,16 +18,38 @@ const NotificationCenter = () => {
   const [notifications, setNotifications] = useState([]);
   const [unreadCount, setUnreadCount] = useState(0);
   const [anchorEl, setAnchorEl] = useState(null);
+  // Ids already shown, so a replayed or repeated event isn't counted twice
+  const seenIds = useRef(new Set());
   const { token, isAuthenticated } = useAuth();
 
   useEffect(() => {
     if (isAuthenticated && token) {
       fetchNotifications();
-      // Poll for new notifications every 30 seconds
-      const interval = setInterval(fetchNotifications, 30000);
-      return () => clearInterval(interval);
+      // New notifications are pushed over server-sent events. On reconnect
+      // the browser sends Last-Event-ID and the server replays what we missed.
+      const source = new EventSource(
+        `/api/notifications/stream?token=${encodeURIComponent(token)}`
+      );
+      source.addEventListener('notification', (event) => {
+        try {
+          const notification = JSON.parse(event.data);
+          if (seenIds.current.has(notification.id)) {
+            return;
+          }
+          seenIds.current.add(notification.id);
+          setNotifications(prev => (
+            prev.some(n => n.id === notification.id) ? prev : [notification, ...prev]
+          ));
+          if (!notification.read) {
+            setUnreadCount(prev => prev + 1);
+          }
+        } catch (error) {
+          console.error('Error processing notification:', error);
+        }
+      });
+      return () => source.close();
     }
-  }, [isAuthenticated, token, fetchNotifications]);
+  }, [isAuthenticated, token]);
 
   const fetchNotifications = async () => {
     if (!token) return;
@@ -48,12 +71,21 @@ const NotificationCenter = () => {
       
       const data = await response.json();
       if (Array.isArray(data)) {
+        data.forEach(n => seenIds.current.add(n.id));
         setNotifications(data);
-        setUnreadCount(data.filter(n => !n.read).length);
       } else {
         console.error('Received invalid notifications data:', data);
         setNotifications([]);
-        setUnreadCount(0);
+      }
+
+      const countResponse = await fetch('/api/notifications/me/unread-count', {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+        },
+      });
+      if (countResponse.ok) {
+        const { unread } = await countResponse.json();
+        setUnreadCount(unread);
       }
     } catch (error) {
       console.error('Error fetching notifications:', error);
@@ -74,21 +106,47 @@ const NotificationCenter = () => {
     if (!token) return;
 
     try {
-      const response = await fetch(`/api/notifications/${notificationId}/read/`, {
-        method: 'POST',
+      const response = await fetch(`/api/notifications/notifications/${notificationId}/read`, {
+        method: 'PUT',
         headers: {
           'Authorization': `Bearer ${token}`,
         },
       });
       
       if (response.ok) {
-        fetchNotifications();
+        setNotifications(prev => prev.map(n => (
+          n.id === notificationId ? { ...n, read: true } : n
+        )));
+        setUnreadCount(prev => Math.max(prev - 1, 0));
       }
     } catch (error) {
       console.error('Error marking notification as read:', error);
     }
   };
 
+  const markAllAsRead = async () => {
+    if (!token || notifications.length === 0) return;
+
+    try {
+      // notifications is newest first, so its head covers everything loaded
+      const response = await fetch('/api/notifications/read', {
+        method: 'PUT',
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ up_to: notifications[0].id }),
+      });
+
+      if (response.ok) {
+        setNotifications(prev => prev.map(n => ({ ...n, read: true })));
+        setUnreadCount(0);
+      }
+    } catch (error) {
+      console.error('Error marking notifications as read:', error);
+    }
+  };
+
   const open = Boolean(anchorEl);
 
   return (
@@ -112,9 +170,16 @@ const NotificationCenter = () => {
         }}
       >
         <Box sx={{ width: 300, maxHeight: 400, overflow: 'auto' }}>
-          <Typography sx={{ p: 2 }} variant="h6">
-            Notifications
-          </Typography>
+          <Box sx={{ p: 2, display: 'flex', alignItems: 'center', justifyContent: 'space-between' }}>
+            <Typography variant="h6">
+              Notifications
+            </Typography>
+            {unreadCount > 0 && (
+              <Button size="small" onClick={markAllAsRead}>
+                Mark all read
+              </Button>
+            )}
+          </Box>
           <Divider />
           <List>
             {notifications && notifications.length > 0 ? (
@@ -21,7 +21,28 @@ export const clearTokens = () => {
     localStorage.removeItem(REFRESH_TOKEN_KEY);
 };
 
-export const refreshAccessToken = async () => {
+// Best effort: the tokens are cleared locally whether or not this succeeds
+export const revokeRefreshToken = async () => {
+    const refreshToken = getRefreshToken();
+    if (!refreshToken) {
+        return;
+    }
+    try {
+        await axios.post('/api/auth/logout', null, {
+            headers: {
+                'Authorization': `Bearer ${refreshToken}`
+            }
+        });
+    } catch (error) {
+        console.error('Error revoking refresh token:', error);
+    }
+};
+
+// One refresh at a time: concurrent 401s share the in-flight request, since
+// each refresh token can only be rotated once
+let refreshInFlight = null;
+
+const rotateTokens = async () => {
     try {
         const refreshToken = getRefreshToken();
         if (!refreshToken) {
@@ -31,7 +52,9 @@ export const refreshAccessToken = async () => {
         const response = await axios.post('/api/auth/refresh', null, {
             headers: {
                 'Authorization': `Bearer ${refreshToken}`
-            }
+            },
+            // Keeps the 401 interceptor from trying to refresh the refresh
+            _retry: true
         });
 
         const { access_token, refresh_token } = response.data;
@@ -44,3 +67,12 @@ export const refreshAccessToken = async () => {
         throw error;
     }
 };
+
+export const refreshAccessToken = () => {
+    if (!refreshInFlight) {
+        refreshInFlight = rotateTokens().finally(() => {
+            refreshInFlight = null;
+        });
+    }
+    return refreshInFlight;
+};
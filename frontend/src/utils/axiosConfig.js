@@ -5,7 +5,8 @@ import { getAccessToken, refreshAccessToken } from './auth';
 axios.interceptors.request.use(
   (config) => {
     const token = getAccessToken();
-    if (token) {
+    // Requests that set their own credentials (token refresh) keep them
+    if (token && !config.headers['Authorization']) {
       config.headers['Authorization'] = `Bearer ${token}`;
     }
     return config;
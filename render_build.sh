@@ -54,6 +54,10 @@ if [ ! -f "backend/static/index.html" ]; then
     exit 1
 fi
 
+# Precompress static assets (.gz/.br served by the backend)
+echo "Precompressing static files..."
+python backend/compress_static.py backend/static
+
 echo "Listing contents of backend/static directory:"
 ls -la backend/static
 